@@ -0,0 +1,301 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*
+#
+# This file is part of pydc1394.
+#
+# pydc1394 is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Lesser General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# pydc1394 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with pydc1394.  If not, see
+# <http://www.gnu.org/licenses/>.
+
+"""
+Micro-benchmarks of the per-frame overhead of pydc1394.
+
+No camera is needed: the frames are built from fake video_frame_t
+structures backed by numpy buffers.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+import timeit
+try:
+    import tracemalloc
+except ImportError: # python 2
+    tracemalloc = None
+from ctypes import ARRAY, c_byte, pointer
+
+import numpy as np
+
+from pydc1394 import Frame, BufferPool
+from pydc1394.convert import yuv_to_rgb, debayer, split_stereo
+from pydc1394.dc1394 import (dll, video_frame_t, color_coding_codes,
+        color_coding_vals, video_mode_codes, video_mode_vals,
+        byte_order_codes_short)
+
+
+def fake_frame(width=1280, height=960, coding="Y8", bytes_per_pixel=1,
+        little_endian=False):
+    """
+    Return a pointer to a video_frame_t describing a numpy buffer and
+    the buffer itself (keep it alive).
+    """
+    data = np.random.randint(0, 256, size=int(width*height*bytes_per_pixel)
+            ).astype(np.uint8)
+    f = video_frame_t()
+    f.image = data.ctypes.data
+    f.size[:] = width, height
+    f.color_coding = color_coding_codes[coding]
+    f.color_filter = 512
+    f.yuv_byte_order = byte_order_codes_short["UYVY"]
+    f.data_depth = int(8*min(bytes_per_pixel, 2))
+    f.stride = int(width*bytes_per_pixel)
+    f.video_mode = video_mode_codes["FORMAT7_0"]
+    f.image_bytes = f.total_bytes = f.allocated_image_bytes = data.size
+    f.little_endian = little_endian
+    return pointer(f), data
+
+
+class LegacyFrame(np.ndarray):
+    """
+    Frame metadata handling as done by pydc1394 2.0 (for comparison).
+    """
+    def __array_finalize__(self, img):
+        if img is None:
+            return
+        for key in ["position", "color_coding", "color_filter",
+                    "yuv_byte_order", "stride", "packet_size",
+                    "packets_per_frame", "timestamp", "frames_behind",
+                    "frame_id", "data_depth", "video_mode"]:
+            setattr(self, key, getattr(img, key, None))
+
+
+def legacy_frame(camera, frame):
+    """
+    The frame construction as done by pydc1394 2.0 (for comparison).
+    """
+    dtyp = ARRAY(c_byte, frame.contents.image_bytes)
+    buf = dtyp.from_address(frame.contents.image)
+    width, height = frame.contents.size
+    pixels = width*height
+    endianess = frame.contents.little_endian and "<" or ">"
+    typ_string = "%su%i" % (endianess,
+            frame.contents.image_bytes/pixels)
+    img = np.ndarray.__new__(LegacyFrame, shape=(height, width),
+            dtype=typ_string, buffer=buf)
+    img.frame_id = frame.contents.id
+    img.frames_behind = frame.contents.frames_behind
+    img.position = frame.contents.position
+    img.packet_size = frame.contents.packet_size
+    img.packets_per_frame = frame.contents.packets_per_frame
+    img.timestamp = frame.contents.timestamp
+    img.video_mode = video_mode_vals[frame.contents.video_mode]
+    img.data_depth = frame.contents.data_depth
+    img.color_coding = color_coding_vals[frame.contents.color_coding]
+    img.color_filter = frame.contents.color_filter
+    img.yuv_byte_order = frame.contents.yuv_byte_order
+    img.stride = frame.contents.stride
+    return img
+
+
+def report(name, func, number):
+    t = min(timeit.repeat(func, number=number, repeat=5))
+    print("%-40s %8.2f us/frame" % (name, t/number*1e6))
+    return t
+
+
+def bench_construction(number=20000):
+    """
+    Per-frame cost of wrapping a dequeued video_frame_t in a Frame.
+    """
+    frame, data = fake_frame()
+    def new():
+        img = Frame(None, frame)
+        img._release.frame = None # nothing to enqueue
+    def old():
+        legacy_frame(None, frame)
+    print("Frame construction (1280x960 Y8):")
+    t_old = report("  legacy (ARRAY type per frame)", old, number)
+    t_new = report("  cached buffer types", new, number)
+    print("  speedup: %.2fx" % (t_old/t_new))
+
+
+def bench_views(number=20000):
+    """
+    Cost of slicing and arithmetic on frames compared to plain arrays.
+    """
+    frame, data = fake_frame(width=640, height=480)
+    img = Frame(None, frame)
+    img._release.frame = None
+    old = legacy_frame(None, frame)
+    plain = img.view(np.ndarray)
+    print("Frame views and ufuncs (640x480 Y8):")
+    for name, a in (("ndarray", plain), ("legacy metadata copy", old),
+            ("shared metadata", img)):
+        report("  crop, %s" % name, lambda: a[10:-10, 20:-20], number)
+    for name, a in (("ndarray", plain), ("legacy metadata copy", old),
+            ("shared metadata", img)):
+        report("  a + 1, %s" % name, lambda: a + 1, number//10)
+
+
+def legacy_to_rgb(img):
+    """
+    Frame.to_rgb() as done by pydc1394 2.0 (for comparison).
+    """
+    height, width = img._size()
+    res = np.ndarray(3*height*width, dtype='u1')
+    inp = np.ndarray(shape=len(img.data), buffer=img.data, dtype='u1')
+    dll.dc1394_convert_to_RGB8(inp, res,
+            width, height, img.yuv_byte_order,
+            color_coding_codes[img.color_coding], img.data_depth)
+    res.shape = height, width, 3
+    return res
+
+
+def count_allocations(convert, number):
+    """
+    Count the calls of ``convert`` that allocated a new output array.
+    """
+    res = convert()
+    allocations = 0
+    tracemalloc.start()
+    for i in range(number):
+        del res
+        before = tracemalloc.get_traced_memory()[0]
+        res = convert()
+        if tracemalloc.get_traced_memory()[0] - before >= res.nbytes:
+            allocations += 1
+    tracemalloc.stop()
+    return allocations
+
+
+def bench_conversion(number=20000):
+    """
+    Allocations and throughput of YUV422 to RGB8 conversion.
+    """
+    frame, data = fake_frame(coding="YUV422", bytes_per_pixel=2)
+    img = Frame(None, frame, BufferPool())
+    img._release.frame = None
+    out = np.empty(img._size() + (3,), "u1")
+    number = max(1, number//100)
+    print("YUV422 to RGB8 conversion (1280x960):")
+    for name, convert in (("legacy", lambda: legacy_to_rgb(img)),
+            ("out=", lambda: img.to_rgb(out=out)),
+            ("buffer pool", lambda: img.to_rgb())):
+        report("  %s" % name, convert, number)
+        if tracemalloc is not None:
+            print("%-40s %8i/%i" % ("    allocations",
+                count_allocations(convert, number), number))
+
+
+def bench_yuv(number=20000):
+    """
+    Throughput of the numpy YUV to RGB8 converter compared to libdc1394.
+    """
+    number = max(1, number//1000)
+    order = byte_order_codes_short["UYVY"]
+    print("YUV to RGB8 conversion (1280x960):")
+    for coding, bpp in (("YUV444", 3), ("YUV422", 2), ("YUV411", 1.5)):
+        frame, data = fake_frame(width=1280, height=960, coding=coding,
+                bytes_per_pixel=bpp)
+        src = data.reshape(960, -1)
+        ref = np.empty((960, 1280, 3), "u1")
+        def convert():
+            dll.dc1394_convert_to_RGB8(data, ref.reshape(-1), 1280, 960,
+                    order, color_coding_codes[coding], 8)
+        report("  %s libdc1394" % coding, convert, number)
+        for threads in (1, 2, 4):
+            out = yuv_to_rgb(src, coding, order, threads=threads)
+            report("  %s numpy, %i threads" % (coding, threads),
+                    lambda: yuv_to_rgb(src, coding, order, out, threads),
+                    number)
+        print("%-40s %8i LSB" % ("    max deviation",
+                np.abs(out.astype(int) - ref).max()))
+
+
+def bench_debayer(number=20000):
+    """
+    Throughput of Bayer demosaicing in parallel strips.
+    """
+    number = max(1, number//1000)
+    src = np.random.randint(0, 256, size=(960, 1280)).astype(np.uint8)
+    print("Bayer demosaicing (1280x960 RAW8):")
+    for method in ("NEAREST", "BILINEAR", "HQLINEAR", "AHD"):
+        ref = debayer(src, "RGGB", method)
+        for threads in (1, 2, 4):
+            out = debayer(src, "RGGB", method, threads=threads)
+            report("  %s, %i threads" % (method, threads),
+                    lambda: debayer(src, "RGGB", method, out=out,
+                        threads=threads), number)
+        print("%-40s %8i LSB" % ("    max deviation",
+                np.abs(out.astype(int) - ref).max()))
+
+
+def bench_native(number=20000):
+    """
+    Native byte order copy-out compared to working on big endian frames.
+    """
+    number = max(1, number//1000)
+    frame, data = fake_frame(coding="Y16", bytes_per_pixel=2)
+    frame.contents.data_depth = 12
+    img = Frame(None, frame, BufferPool())
+    img._release.frame = None
+    out = img.to_native()
+    print("Y16 big endian vs native (1280x960):")
+    report("  copy()", lambda: img.copy(), number)
+    report("  copy().astype('=u2')", lambda: img.copy().astype("=u2"),
+            number)
+    report("  to_native(out=)", lambda: img.to_native(out=out), number)
+    report("  to_native(out=, align=True)",
+            lambda: img.to_native(out=out, align=True), number)
+    for name, op in (("sum()", lambda a: a.sum()),
+            ("max()", lambda a: a.max()),
+            ("mean()", lambda a: a.mean()),
+            ("a*3 + 1", lambda a: a*3 + 1)):
+        for order, a in ((">u2", img), ("native", out)):
+            report("  %s, %s" % (name, order), lambda: op(a), number)
+
+
+def bench_stereo(number=20000):
+    """
+    Throughput of splitting interlaced stereo frames.
+    """
+    number = max(1, number//1000)
+    frame, data = fake_frame(coding="Y16", bytes_per_pixel=2)
+    img = Frame(None, frame, BufferPool())
+    img._release.frame = None
+    src = img.view(np.ndarray)
+    out = np.empty((2,) + img.shape, "u1")
+    print("Stereo deinterlacing (2x 1280x960):")
+    for engine in ("dc1394", "numpy"):
+        report("  %s" % engine,
+                lambda: split_stereo(src, out=out, engine=engine), number)
+    report("  Frame.split_stereo() (buffer pool)",
+            lambda: img.split_stereo(), number)
+
+
+def main():
+    from optparse import OptionParser
+    p = OptionParser(usage="%prog [benchmark ...]")
+    p.set_defaults(number=20000)
+    p.add_option("-n", "--number", type="int",
+            help="iterations per measurement")
+    o, a = p.parse_args()
+    benchmarks = dict((k[len("bench_"):], v) for k, v in globals().items()
+            if k.startswith("bench_"))
+    for name in a or sorted(benchmarks):
+        benchmarks[name](o.number)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -33,16 +33,10 @@ def setup(cam, mode, gain, bright, shutter):
 
 
 def capture(cam, n):
-    cam.start_capture()
-    cam.flush()
-    cam.start_multi_shot(n+1)
-    t = time.time()
-    for i in range(n):
-        im = cam.dequeue()
-        print(i, (time.time()-t)/(i+1), im.frames_behind, im.frame_id)
-        im.enqueue()
-    cam.stop_multi_shot()
-    cam.stop_capture()
+    with cam.stream(mode="multi_shot", n=n+1) as frames:
+        t = time.time()
+        for i, im in zip(range(n), frames):
+            print(i, (time.time()-t)/(i+1), im.frames_behind, im.frame_id)
 
 def main():
     from optparse import OptionParser
@@ -3,21 +3,77 @@
 from __future__ import (print_function, unicode_literals, division,
         absolute_import)
 
-from pydc1394 import Camera, DC1394Error
-from struct import pack, unpack, calcsize
+from pydc1394 import Camera
+from pydc1394.registers import RegisterMap, Field, as_float, as_bytes
 import time
 import numpy as np
 import pylab as pl
 from qo.uncertain import Uncertain
 
 
+# Point Grey advanced registers
+pgr_info = RegisterMap("PGRInfo", [
+    ("temp_avail", Field(0x82c, 31)),
+    ("temp", Field(0x82c, (11, 0), lambda v: v*.1-273.2)),
+    ("xmit_fail", Field(0x12fc)),
+    ("gpio_avail", Field(0x1100, (19, 16))),
+    ("gpio_state", Field(0x1100, (3, 0))),
+    ("gpio0", Field(0x1110, count=3)),
+    ("gpio1", Field(0x1120, count=3)),
+    ("gpio2", Field(0x1130, count=3)),
+    ("gpio3", Field(0x1140, count=3)),
+    ("strobe_at_integration", Field(0x1104, 31, bool)),
+    ("queue_trigger", Field(0x1104, 30, bool)),
+    ("pio_out", Field(0x11f0, (31, 28))),
+    ("pio_in", Field(0x11f4, (31, 28))),
+    ("pio_dir", Field(0x11f8, (31, 28))),
+    ("up", Field(0x12e0)),
+    ("reset", Field(0x12e4)),
+    ("finfo_avail", Field(0x12f8, 31)),
+    ("finfo", Field(0x12f8, (9, 0))),
+    ("led_avail", Field(0x1a14, 31)),
+    ("led", Field(0x1a14, (7, 0), bool)),
+    ("volt_avail", Field(0x1a50, 31)),
+    ("volt_number", Field(0x1a50, (23, 12))),
+    ("defect_avail", Field(0x1a60, 31)),
+    ("defect_on", Field(0x1a60, 25)),
+    ("defect_max", Field(0x1a60, (23, 12))),
+    ("defect_cur", Field(0x1a60, (11, 0))),
+    ("dark_avail", Field(0x1098, 31)),
+    ("dark_on", Field(0x1098, 25)),
+    ("dark_min", Field(0x1098, (23, 12))),
+    ("dark_max", Field(0x1098, (11, 0))),
+    ("f7_avail", Field(0x1ac8, 31)),
+    ("f7_hbin", Field(0x1ac8, (23, 20), lambda v: v+1)),
+    ("f7_vbin", Field(0x1ac8, (19, 16), lambda v: v+1)),
+    ("pixel_clock", Field(0x1af0, convert=as_float)),
+    ("h_clock", Field(0x1af4, convert=as_float)),
+    ("msglog", Field(0x1d00, count=64, convert=lambda r: as_bytes(r[::-1]))),
+    ("serial", Field(0x1f20)),
+    ("board", Field(0x1f24, (31, 20))),
+    ("board_rev", Field(0x1f24, (19, 16))),
+    ("sensor_typ1", Field(0x1f28, (31, 20))),
+    ("sensor_rev", Field(0x1f28, (19, 16))),
+    ("sensor_typ2", Field(0x1f28, (3, 0))),
+    ("built", Field(0x1f40)),
+    ("fw_major", Field(0x1f60, (31, 24))),
+    ("fw_minor", Field(0x1f60, (23, 16))),
+    ("fw_typ", Field(0x1f60, (23, 20))),
+    ("fw_rev", Field(0x1f60, (11, 0))),
+    ("fw_built", Field(0x1f64)),
+    ("fw_desc", Field(0x1f68, count=6, convert=as_bytes)),
+], max_gap=0) # only read the implemented registers
+
+finfo_fields = ["timestamp", "gain", "shutter", "brightness",
+    "exposure", "whitebalance", "framecount", "strobecount", "gpio",
+    "roi"]
+
 def info(cam):
     print("vendor: %s" % cam.vendor)
     print("model: %s" % cam.model)
     print("guid: %x" % cam.guid)
 
-    for f in cam.features:
-        feat = getattr(cam, f)
+    for f, feat in sorted(cam.feature_snapshot().items()):
         if feat.absolute_capable:
             v = feat.absolute
         else:
@@ -27,140 +83,101 @@ def info(cam):
     m0 = cam.mode
     for m in cam.modes:
         cam.mode = m
-        try:
-            r = cam.mode.rates
+        r = m.rates
+        if r:
             cam.rate = max(r)
-        except DC1394Error:
-            r = None
         print("mode %s: %s (%g, %g)" % (m, r,
                 cam.framerate.absolute_range[0],
                 cam.framerate.absolute_range[1]))
     cam.mode = m0
 
-    temp = cam.get_register(0x82c)
-    print("temp: avail %s, val %sC" % (temp>>31,
-            (temp&0xfff)*.1-273.2))
+    r = pgr_info.read(cam)
+    print("temp: avail %s, val %sC" % (r.temp_avail, r.temp))
     
-    print("xmit fail: %s" % cam.get_register(0x12fc))
+    print("xmit fail: %s" % r.xmit_fail)
 
-    gpio = cam.get_register(0x1100)
-    print("gpio: avail %s, state %s" % ((gpio>>16)&0xf, bin(gpio&0xf)))
+    print("gpio: avail %s, state %s" % (r.gpio_avail, bin(r.gpio_state)))
 
-    for i,r in enumerate(range(0x1110, 0x114b, 0x10)):
-        ctrl = cam.get_register(r)
+    for i, gpio in enumerate((r.gpio0, r.gpio1, r.gpio2, r.gpio3)):
+        ctrl, xtra, mask = gpio.tolist()
         print("gpio%i: av %s, mode %s, data %s," % (i,
                 ctrl>>31, ctrl>>16&0xf, bin(ctrl&0xff)), end=" ")
-        xtra = cam.get_register(r+0x4)
         print("xtra1: %s, xtra2: %s," % (bin(xtra>>16&0xff),
                 bin(xtra&0xff)), end=" ")
-        mask = cam.get_register(r+0x8)
         print("mask av: %s, en: %s" % ((mask>>31)&0x1,
                 bin((mask>16)&0xff)))
 
-    gpio_x = cam.get_register(0x1104)
     print("gpio_xtra: strobe at integration: %s, queue trigger: %s" % (
-            bool(gpio_x>>31), bool(gpio_x>>30&1)))
+            r.strobe_at_integration, r.queue_trigger))
 
-    pioo = cam.get_register(0x11f0)
-    pioi = cam.get_register(0x11f4)
-    piod = cam.get_register(0x11f8)
-    print("pio: out %s, in %s, dir %s" % (bin((pioo>>28)&0xf),
-                bin((pioi>>28)&0xf), bin((piod>>28)&0xf)))
+    print("pio: out %s, in %s, dir %s" % (bin(r.pio_out), bin(r.pio_in),
+            bin(r.pio_dir)))
 
     s = cam.get_strobe(0x0)
     print("strobe: presence %s" % bin(s>>28))
-    for i, r in enumerate(range(0, 0x10, 0x4)):
+    for i, o in enumerate(range(0, 0x10, 0x4)):
         if s & (1<<(31-i)):
-            st = cam.get_strobe(0x100+r)
+            st = cam.get_strobe(0x100+o)
             print("strobe%s av: %s, read: %s, switch: %s, pol: %s, "\
                 "min: %s, max: %s" % (i, bool(st>>31), bool(st>>27&1), 
                         bool(st>>26&1), bool(st>>25&1),
                         st>>12&0xfff, st&0xfff))
-            mod = cam.get_strobe(0x200+r)
+            mod = cam.get_strobe(0x200+o)
             print("strobe%s av: %s, on: %s, pol: %s, dly: %s, dur: %s" % (
                     i, bool(mod>>31), bool(mod>>25&1), bool(mod>>24&1),
                     mod>>12&0xfff, mod&0xfff))
 
-    up = cam.get_register(0x12e0)
-    reset = cam.get_register(0x12e4)
-    print("up %ss, reset %ss" % (up, reset))
+    print("up %ss, reset %ss" % (r.up, r.reset))
 
-    finfo_fields = ["timestamp", "gain", "shutter", "brightness",
-        "exposure", "whitebalance", "framecount", "strobecount", "gpio",
-        "roi"]
-    finfo = cam.get_register(0x12f8)
-    print("frameinfo: avail %s, %s (%s)" % (finfo>>31,
-            bin(finfo&0x3ff), ", ".join(
-        v for i,v in enumerate(finfo_fields) if finfo & (1<<i))))
+    print("frameinfo: avail %s, %s (%s)" % (r.finfo_avail,
+            bin(r.finfo), ", ".join(
+        v for i,v in enumerate(finfo_fields) if r.finfo & (1<<i))))
 
-    led = cam.get_register(0x1a14)
-    print("led: avail %s, state %s" % (led>>31, bool(led&0xff)))
+    print("led: avail %s, state %s" % (r.led_avail, r.led))
 
-    voltlo = cam.get_register(0x1a50)
-    volthi = cam.get_register(0x1a54)
-    print("volt: avail %s, number %s" % (voltlo>>31,
-            bin((voltlo>>12)&0xfff)))
+    print("volt: avail %s, number %s" % (r.volt_avail, bin(r.volt_number)))
 
-    defect = cam.get_register(0x1a60)
     print("pixel defects: avail %s, on %s, max %s, cur %s" % (
-            defect>>31, (defect>>25)&1, (defect>>12)&0xfff,
-            (defect&0xfff)))
+            r.defect_avail, r.defect_on, r.defect_max, r.defect_cur))
 
     #cam[0x1098] |= (1<<25)
-    auto_shutter_range = cam.get_register(0x1098)
     print("min dark noise: avail %s, on %s, min %s, max %s" % (
-            auto_shutter_range>>31, (auto_shutter_range>>25)&1,
-            (auto_shutter_range>>12)&0xfff, (auto_shutter_range&0xfff)))
+            r.dark_avail, r.dark_on, r.dark_min, r.dark_max))
 
-    f7 = cam.get_register(0x1ac8)
-    print("format7: avail %s, bin %s by %s" % (f7>>31,
-            ((f7>>20)&0xf)+1, ((f7>>16)&0xf)+1))
+    print("format7: avail %s, bin %s by %s" % (r.f7_avail, r.f7_hbin,
+            r.f7_vbin))
 
-    pxclk = cam.get_register(0x1af0)
-    print("pxlclock: %s MHz" % (unpack("f", pack("I", pxclk))[0]/1e6))
-    hclk = cam.get_register(0x1af4)
-    print("hclock: %s kHz" % (unpack("f", pack("I", hclk))[0]/1e3))
+    print("pxlclock: %s MHz" % (r.pixel_clock/1e6))
+    print("hclock: %s kHz" % (r.h_clock/1e3))
 
-    print("msglog: %r" % "".join([
-            unpack("4s", pack("!I", cam.get_register(r)))[0]
-            for r in range(0x1d00, 0x1e00, 0x4)][::-1]))
+    print("msglog: %r" % r.msglog)
 
-    print("serial: %s" % cam.get_register(0x1f20))
+    print("serial: %s" % r.serial)
 
-    board = cam.get_register(0x1f24)
-    print("board: %s, rev %s" % (hex((board>>20)&0xfff), (board>>16)&0xf))
+    print("board: %s, rev %s" % (hex(r.board), r.board_rev))
 
-    sensor = cam.get_register(0x1f28)
-    print("sensor: typ1 %s, rev %s, typ2 %s" % (hex(sensor>>20),
-            (sensor>>16)&0xf, hex(sensor&0xf)))
+    print("sensor: typ1 %s, rev %s, typ2 %s" % (hex(r.sensor_typ1),
+            r.sensor_rev, hex(r.sensor_typ2)))
 
-    built = cam.get_register(0x1f40)
-    print("built %s" % time.ctime(built))
+    print("built %s" % time.ctime(r.built))
 
-    fw = cam.get_register(0x1f60)
-    print("firmware %s.%s (typ %s) rev %s" % (fw>>24, (fw>>16)&0xff,
-            (fw>>20)&0xf, fw&0xfff))
+    print("firmware %s.%s (typ %s) rev %s" % (r.fw_major, r.fw_minor,
+            r.fw_typ, r.fw_rev))
 
-    built = cam.get_register(0x1f64)
-    print("firmware built %s" % time.ctime(built))
+    print("firmware built %s" % time.ctime(r.fw_built))
 
-    print("firmware desc: %r" % "".join(
-            unpack("4s", pack("!I", cam.get_register(r)))[0]
-            for r in range(0x1f68, 0x1f80, 0x4)))
+    print("firmware desc: %r" % r.fw_desc)
 
 def capture(cam, n, crop):
-    cam.start_capture()
-    cam.flush()
-    cam.start_multi_shot(n+2) # one for corruption safety, one for dump
-    cam.dequeue().enqueue() # dump this
     ims = []
-    while len(ims) < n:
-        im = cam.dequeue()
-        if not im.corrupt:
-            ims.append(im[crop:-crop, crop:-crop].copy())
-        im.enqueue()
-    cam.stop_multi_shot()
-    cam.stop_capture()
+    # one for corruption safety, one for dump
+    with cam.stream(mode="multi_shot", n=n+2) as frames:
+        next(frames) # dump this
+        for im in frames:
+            if not im.corrupt:
+                ims.append(im[crop:-crop, crop:-crop].copy())
+            if len(ims) == n:
+                break
     return np.array(ims).astype("double")
 
 def noise_mean(ims):
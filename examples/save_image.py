@@ -54,14 +54,10 @@ for feat in cam0.features:
 print(cam0.modes)
 cam0.mode = cam0.modes[0]
 
-cam0.start_capture()
-cam0.start_one_shot()
-matrix = cam0.dequeue()
+with cam0.stream(mode="one_shot", copy=True) as frames:
+    matrix = next(frames)
 print("Shape:", matrix.shape)
-i = Image.fromarray(matrix.copy())
-matrix.enqueue()
-cam0.stop_one_shot()
-cam0.stop_capture()
+i = Image.fromarray(matrix)
 i.save("t.bmp")
 
 i.show()
@@ -39,15 +39,7 @@ class CameraPlot:
 
     def process_images(self):
         QtCore.QTimer.singleShot(50, self.process_images)
-        frame = None
-        while True:
-            frame_ = self.camera.dequeue(poll=True)
-            if frame_ is not None:
-                if frame is not None:
-                    frame.enqueue()
-                frame = frame_
-            else:
-                break
+        frame = self.camera.dequeue_latest()
         if frame is None:
             return
         im = frame.copy().T
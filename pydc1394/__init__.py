@@ -24,3 +24,7 @@ from __future__ import (print_function, unicode_literals, division,
 
 from .camera2 import *
 from .threaded_camera import *
+from .group import *
+from .clock import *
+from .bandwidth import *
+from .tuning import *
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Sharing the isochronous bandwidth of a bus between Format7 cameras.
+
+A Format7 camera sends one packet of :attr:`Format7.packet_size
+<pydc1394.camera2.Format7.packet_size>` bytes per bus cycle (8000 per
+second). The packet size therefore determines both the maximum frame
+rate and the share of the 4915 bandwidth units per cycle a camera
+occupies.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+from collections import namedtuple
+
+from .dc1394 import USE_RECOMMENDED, DC1394Error, DC1394Exception
+from .clock import CYCLES_PER_SECOND
+from .camera2 import Format7, _frame_bytes
+
+
+__all__ = ["BandwidthPlanner", "PlanEntry", "bandwidth_units",
+    "frame_rate"]
+
+
+# bandwidth units available per cycle (one unit is the time to send a
+# quadlet at S1600)
+BANDWIDTH_UNITS = 4915
+
+# the maximum isochronous payload in bytes per packet for each speed
+max_payload = {100: 1024, 200: 2048, 400: 4096, 800: 8192, 1600: 16384,
+        3200: 32768}
+
+
+def bandwidth_units(packet_size, iso_speed):
+    """
+    The bandwidth units per cycle used by packets of ``packet_size``
+    bytes at ``iso_speed`` (in Mbps). The packet header is included.
+    Identical to :attr:`pydc1394.camera2.Camera.bandwidth_usage`.
+    """
+    return (packet_size//4 + 3)*1600//iso_speed
+
+
+def frame_rate(frame_bytes, packet_size):
+    """
+    The maximum frame rate at which frames of ``frame_bytes`` bytes
+    can be transmitted with packets of ``packet_size`` bytes.
+    """
+    return CYCLES_PER_SECOND/-(-frame_bytes//packet_size)
+
+
+class PlanEntry(namedtuple("PlanEntry", [
+        "camera", "mode", "image_size", "image_position", "color_coding",
+        "packet_size", "rate", "units"])):
+    """
+    The planned settings of one camera as returned by
+    :meth:`BandwidthPlanner.plan`.
+
+    ``rate`` is the maximum frame rate the bus allows with this
+    ``packet_size`` (the camera may be slower, e.g. due to its shutter)
+    and ``units`` are the bandwidth units used per cycle.
+    """
+    __slots__ = ()
+
+
+class BandwidthPlanner(object):
+    """
+    Plan and apply the packet sizes of several cameras in Format7 modes
+    that share one bus.
+
+    Add the cameras with their ROIs and target frame rates with
+    :meth:`add`. :meth:`plan` distributes the ``available`` bandwidth
+    units such that the sum of the frame rates (each up to its target)
+    is maximized. :meth:`apply` configures all cameras or none.
+    """
+
+    def __init__(self, available=BANDWIDTH_UNITS):
+        self.available = available
+        self._entries = []
+
+    def add(self, camera, mode=None, image_size=None,
+            image_position=(0, 0), color_coding=None, rate=None):
+        """
+        Add ``camera`` to the plan.
+
+        ``mode`` is the :class:`pydc1394.camera2.Format7` mode or its
+        name and defaults to the current mode. ``image_size`` defaults
+        to the maximum size and ``color_coding`` to the current color
+        coding of the mode. The frame rate is not raised above ``rate``
+        if given.
+        """
+        if any(e[0] is camera for e in self._entries):
+            raise ValueError("%s was already added" % camera)
+        if mode is None:
+            mode = camera.mode
+        elif not isinstance(mode, Format7):
+            mode = camera.modes_dict[mode]
+        if not isinstance(mode, Format7):
+            raise ValueError("%s is not a Format7 mode" % mode)
+        if image_size is None:
+            image_size = mode.max_image_size
+        if color_coding is None:
+            color_coding = mode.color_coding
+        mode._check_roi(image_size, image_position, color_coding,
+                USE_RECOMMENDED)
+        self._entries.append((camera, mode, tuple(image_size),
+            tuple(image_position), color_coding, rate))
+
+    def _slots(self):
+        """
+        The frame size, packet parameters and speed of each entry.
+        """
+        for camera, mode, size, position, color, rate in self._entries:
+            frame_bytes = _frame_bytes(size, color)
+            speed = camera.iso_speed
+            unit, maximum = _packet_parameters(mode, size, position, color)
+            maximum = min(maximum, max_payload[speed])
+            if unit > maximum:
+                raise ValueError("%s can not send packets at %s Mbps" % (
+                    camera, speed))
+            yield frame_bytes, unit, maximum, speed, rate
+
+    @staticmethod
+    def _step(packet_size, frame_bytes, unit, maximum, rate):
+        """
+        The next larger packet size that increases the frame rate or
+        ``None``.
+        """
+        packets = -(-frame_bytes//packet_size)
+        if packets == 1 or (rate is not None and
+                CYCLES_PER_SECOND/packets >= rate):
+            return
+        step = -(-frame_bytes//(packets - 1))
+        step += -step % unit
+        if step <= maximum:
+            return step
+
+    def plan(self):
+        """
+        Compute the packet sizes and return a list of
+        :class:`PlanEntry`, one per camera.
+
+        Starting from the smallest packets, the packet size of the
+        camera with the largest frame rate gain per bandwidth unit is
+        raised as long as the bandwidth suffices. Raises a
+        :class:`ValueError` if even the smallest packets exceed the
+        available bandwidth.
+
+        The packet parameters depend on the ROI and are read from the
+        cameras after setting each ROI. The previous ROIs are restored
+        but the transmission of the cameras should be stopped.
+        """
+        slots = list(self._slots())
+        packets = [unit for frame_bytes, unit, maximum, speed, rate
+                in slots]
+        used = sum(bandwidth_units(p, s[3]) for p, s in zip(packets, slots))
+        if used > self.available:
+            raise ValueError("the cameras need at least %i of %i "
+                    "bandwidth units" % (used, self.available))
+        def gain(packet_size, frame_bytes, rate):
+            r = frame_rate(frame_bytes, packet_size)
+            return r if rate is None else min(r, rate)
+        while True:
+            best = None
+            for i, (frame_bytes, unit, maximum, speed, rate) in enumerate(
+                    slots):
+                step = self._step(packets[i], frame_bytes, unit, maximum,
+                        rate)
+                if step is None:
+                    continue
+                cost = (bandwidth_units(step, speed) -
+                        bandwidth_units(packets[i], speed))
+                if used + cost > self.available:
+                    continue
+                value = (gain(step, frame_bytes, rate) -
+                        gain(packets[i], frame_bytes, rate))/max(cost, 1)
+                if best is None or value > best[0]:
+                    best = value, i, step, cost
+            if best is None:
+                break
+            value, i, step, cost = best
+            packets[i] = step
+            used += cost
+        return [PlanEntry(camera, mode, size, position, color, p,
+            frame_rate(s[0], p), bandwidth_units(p, s[3]))
+            for (camera, mode, size, position, color, rate), p, s in zip(
+                self._entries, packets, slots)]
+
+    def apply(self, plan=None):
+        """
+        Configure the cameras according to ``plan`` (by default a new
+        :meth:`plan`) and return it.
+
+        The transmission of the cameras must be stopped. If any camera
+        fails to accept its settings or if the cameras report more
+        bandwidth usage (see
+        :attr:`pydc1394.camera2.Camera.bandwidth_usage`) than available,
+        the previous modes and ROIs of all cameras are restored and the
+        error is raised.
+        """
+        if plan is None:
+            plan = self.plan()
+        saved = []
+        try:
+            for entry in plan:
+                saved.append((entry.camera, entry.camera.mode, entry.mode,
+                    entry.mode.roi))
+                entry.camera.mode = entry.mode
+                entry.mode.roi = (entry.image_size, entry.image_position,
+                        entry.color_coding, entry.packet_size)
+            used = sum(entry.camera.bandwidth_usage for entry in plan)
+            if used > self.available:
+                raise DC1394Exception("the cameras use %i of %i bandwidth "
+                        "units" % (used, self.available))
+        except (DC1394Error, DC1394Exception, ValueError):
+            _restore(saved)
+            raise
+        return plan
+
+
+def _packet_parameters(mode, size, position, color):
+    """
+    The packet unit and maximum of ``mode`` for the given ROI.
+
+    The camera reports them for its current ROI which is therefore set
+    temporarily.
+    """
+    previous = mode.roi
+    try:
+        mode.roi = size, position, color, USE_RECOMMENDED
+        return mode.packet_parameters
+    finally:
+        mode.roi = previous
+
+
+def _restore(saved):
+    """
+    Restore the modes and ROIs of cameras as well as possible.
+    """
+    for camera, previous, mode, roi in reversed(saved):
+        try:
+            mode.roi = roi
+            camera.mode = previous
+        except (DC1394Error, DC1394Exception, ValueError):
+            pass
@@ -23,16 +23,30 @@
 from __future__ import (print_function, unicode_literals, division,
         absolute_import)
 
-from ctypes import byref, POINTER, c_uint32, c_int32, c_float
+import select
+from collections import namedtuple
+from contextlib import contextmanager
+from ctypes import byref, POINTER, c_uint32, c_int32, c_uint64, c_float
+try:
+    from time import monotonic
+except ImportError: # python 2
+    from time import time as monotonic
+
+from numpy import empty, uint32, ascontiguousarray
 
 from .dc1394 import *
 from .frame import *
+from .clock import CycleClock
+from .embedded import (embedded_fields, decode_embedded,
+        EMBEDDED_INFO_REGISTER)
 
 
 
-__all__ = ["Context", "Feature", "Trigger", "Whitebalance", "Whiteshading",
-    "Mode", "Format7", "Exif", "Camera", "DC1394Error", "DC1394Exception",
-    "Frame"]
+__all__ = ["Context", "Feature", "FeatureInfo", "Trigger", "Whitebalance",
+    "Whiteshading", "Mode", "ModeInfo", "Format7", "Format7Info", "Exif",
+    "Camera",
+    "DC1394Error",
+    "DC1394Exception", "Frame", "BufferPool"]
 
 
 class Context(object):
@@ -49,15 +63,19 @@ class Context(object):
     :class:`Camera` objects.
 
     The available camera GUIDs can be obtained from the :attr:`cameras`
-    list. To obtain a :class:`Camera` object for a certain camera,
-    either the :meth:`camera` method of a :class:`Context` object 
-    can be used or the context can be passed to the :class:`Camera`
-    constructor.
+    list (or searched with :meth:`find`). To obtain a :class:`Camera`
+    object for a certain camera, either the :meth:`camera` method of a
+    :class:`Context` object can be used or the context can be passed to
+    the :class:`Camera` constructor.
     """
     _handle = None
+    _probe = None
 
     def __init__(self):
         self._handle = dll.dc1394_new()
+        self._cameras = None
+        self._generation = None
+        self._names = {}
 
     def __del__(self):
         self.close()
@@ -68,10 +86,47 @@ class Context(object):
         
         After calling this, all cameras in this context are invalid.
         """
+        self._free_probe()
         if self._handle is not None:
             dll.dc1394_free(self._handle)
         self._handle = None
 
+    def _free_probe(self):
+        if self._probe is not None:
+            dll.dc1394_camera_free(self._probe)
+        self._probe = None
+
+    def _bus_generation(self):
+        """
+        The current generation of the bus of the first enumerated
+        camera. It changes with each bus reset.
+        """
+        node, generation = c_uint32(), c_uint32()
+        dll.dc1394_camera_get_node(self._probe, byref(node),
+                byref(generation))
+        return generation.value
+
+    def refresh(self):
+        """
+        Enumerate the cameras attached to the system again and return
+        them (see :attr:`cameras`).
+        """
+        self._free_probe()
+        cam_list = POINTER(camera_list_t)()
+        dll.dc1394_camera_enumerate(self._handle, byref(cam_list))
+        cams = [(cam.guid, cam.unit) for cam in
+                cam_list.contents.ids[:cam_list.contents.num]]
+        dll.dc1394_camera_free_list(cam_list)
+        self._cameras = cams
+        self._generation = None
+        if cams:
+            # keep a handle to watch the bus generation
+            probe = dll.dc1394_camera_new_unit(self._handle, *cams[0])
+            if probe:
+                self._probe = probe
+                self._generation = self._bus_generation()
+        return list(cams)
+
     @property
     def cameras(self):
         """
@@ -84,13 +139,63 @@ class Context(object):
         to identify an IIDC camera.
         
         If present, multiple cards will be probed.
-        """
-        cam_list = POINTER(camera_list_t)()
-        dll.dc1394_camera_enumerate(self._handle, byref(cam_list))
-        cams = [(cam.guid, cam.unit) for cam in
-                cam_list.contents.ids[:cam_list.contents.num]]
-        dll.dc1394_camera_free_list(cam_list)
-        return cams
+
+        The enumeration is cached. It is repeated if the bus generation
+        of the first camera changes (after a bus reset, e.g. if a camera
+        was plugged in or removed), if no camera was found, or if
+        :meth:`refresh` is called. Use :meth:`refresh` for changes on
+        other buses.
+        """
+        if self._probe is None:
+            return self.refresh()
+        try:
+            generation = self._bus_generation()
+        except DC1394Error:
+            generation = None
+        if generation != self._generation:
+            return self.refresh()
+        return list(self._cameras)
+
+    def _name(self, guid, unit):
+        """
+        The (cached) vendor and model names of a camera.
+        """
+        try:
+            return self._names[guid, unit]
+        except KeyError:
+            pass
+        handle = self.camera_handle(guid, unit)
+        try:
+            names = tuple(n.decode("utf-8", "replace")
+                    if isinstance(n, bytes) else n for n in (
+                        handle.contents.vendor, handle.contents.model))
+        finally:
+            dll.dc1394_camera_free(handle)
+        self._names[guid, unit] = names
+        return names
+
+    def find(self, guid=None, vendor=None, model=None):
+        """
+        The (GUID, unit) tuples of the cameras in :attr:`cameras` with
+        the given ``guid`` (an integer or a hexadecimal string),
+        ``vendor`` name or ``model`` name (all if ``None``).
+
+        The vendor and model names are read only once per camera.
+        """
+        if isinstance(guid, str):
+            guid = int(guid, 16)
+        found = []
+        for cam in self.cameras:
+            if guid is not None and cam[0] != guid:
+                continue
+            if vendor is not None or model is not None:
+                v, m = self._name(*cam)
+                if vendor is not None and v != vendor:
+                    continue
+                if model is not None and m != model:
+                    continue
+            found.append(cam)
+        return found
 
     def camera_handle(self, guid, unit=None):
         """
@@ -121,6 +226,23 @@ class Context(object):
         return Camera(context=self, handle=handle, **kwargs)
 
 
+class FeatureInfo(namedtuple("FeatureInfo", [
+        "name", "present", "switchable", "active", "modes", "mode",
+        "readable", "value", "value_range", "absolute_capable",
+        "absolute_control", "absolute", "absolute_range",
+        "polarity_capable", "polarity", "source", "sources"])):
+    """
+    An immutable record of the complete state of a :class:`Feature` as
+    returned by :meth:`Feature.info` and
+    :meth:`Camera.feature_snapshot`.
+
+    The fields correspond to the attributes of the feature.
+    ``polarity``, ``source`` and ``sources`` only apply to the
+    :class:`Trigger` and are ``None`` otherwise.
+    """
+    __slots__ = ()
+
+
 class Feature(object):
     """
     A feature of a dc1394 camera.
@@ -335,8 +457,56 @@ class Feature(object):
                 byref(min_val), byref(max_val))
         return min_val.value, max_val.value
 
+    def _value_info(self, finfo):
+        """
+        The :attr:`value` from the ``feature_info_t`` ``finfo``.
+        """
+        return finfo.value
+
+    def _info(self, finfo):
+        """
+        Decode the ``feature_info_t`` ``finfo`` into a
+        :class:`FeatureInfo`.
+        """
+        return FeatureInfo(
+                name=feature_vals[finfo.id],
+                present=bool(finfo.available),
+                switchable=bool(finfo.on_off_capable),
+                active=bool(finfo.is_on),
+                modes=tuple(feature_mode_vals[i]
+                    for i in finfo.modes.modes[:finfo.modes.num]),
+                mode=feature_mode_vals.get(finfo.current_mode),
+                readable=bool(finfo.readout_capable),
+                value=self._value_info(finfo),
+                value_range=(finfo.min, finfo.max),
+                absolute_capable=bool(finfo.absolute_capable),
+                absolute_control=bool(finfo.abs_control),
+                absolute=finfo.abs_value,
+                absolute_range=(finfo.abs_min, finfo.abs_max),
+                polarity_capable=bool(finfo.polarity_capable),
+                polarity=None, source=None, sources=None)
+
+    def info(self):
+        """
+        The complete state of this feature as a :class:`FeatureInfo`
+        obtained with a single call to libdc1394.
+
+        Use :meth:`Camera.feature_snapshot` to get all features at once.
+        """
+        finfo = feature_info_t()
+        finfo.id = self._feature_id
+        dll.dc1394_feature_get(self._cam, byref(finfo))
+        return self._info(finfo)
+
+    def _same_value(self, state, value):
+        """
+        Does the :class:`FeatureInfo` ``state`` already hold the integer
+        ``value``?
+        """
+        return state.value == int(value)
+
     def setup(self, value=None, active=True, mode="manual", absolute=True,
-            **kwargs):
+            state=None, **kwargs):
         """
         Set up several properties of this feature with one call.
 
@@ -344,25 +514,46 @@ class Feature(object):
         to "manual" and "absolute" control. You can pass a value if
         desired. Any additional keyword arguments will be set as
         attributes.
-        """
-        self.active = active
+
+        Only the properties that differ from the current ``state`` (a
+        :class:`FeatureInfo`, read with :meth:`info` if not given) are
+        written. Values that are not :attr:`readable` are always
+        written. Returns a dictionary of the properties written.
+        """
+        if state is None:
+            state = self.info()
+        writes = {}
+        def write(key, val):
+            setattr(self, key, val)
+            writes[key] = val
+        if bool(state.active) != bool(active):
+            write("active", active)
         if not active:
-            return
+            return writes
         if mode is not None:
-            self.mode = mode
-            if mode == ("auto", "one_push"):
-                return
+            # one_push is an action and always triggered
+            if state.mode != mode or mode == "one_push":
+                write("mode", mode)
+            if mode in ("auto", "one_push"):
+                return writes
         for key, val in kwargs.items():
             if hasattr(self, key):
-                setattr(self, key, val)
-        if absolute is not None and self.absolute_capable:
-            self.absolute_control = absolute
+                if getattr(state, key, None) != val:
+                    write(key, val)
+        if absolute is not None and state.absolute_capable:
+            if state.absolute_control != bool(absolute):
+                write("absolute_control", absolute)
         if value is None:
-            return
+            return writes
         if absolute:
-            self.absolute = value
+            # compare at the precision the camera stores
+            if (not state.readable or
+                    state.absolute != c_float(value).value):
+                write("absolute", value)
         else:
-            self.value = value
+            if not state.readable or not self._same_value(state, value):
+                write("value", value)
+        return writes
 
 
 class Trigger(Feature):
@@ -496,6 +687,19 @@ class Trigger(Feature):
         return [trigger_source_vals_short[i]
                 for i in src.sources[:src.num]]
 
+    def _info(self, finfo):
+        modes = finfo.trigger_modes
+        sources = finfo.trigger_sources
+        return Feature._info(self, finfo)._replace(
+                modes=tuple(trigger_mode_vals_short[i]
+                    for i in modes.modes[:modes.num]),
+                mode=trigger_mode_vals_short.get(finfo.trigger_mode),
+                polarity=trigger_polarity_vals_short.get(
+                    finfo.trigger_polarity),
+                source=trigger_source_vals_short.get(finfo.trigger_source),
+                sources=tuple(trigger_source_vals_short[i]
+                    for i in sources.sources[:sources.num]))
+
     @property
     def software(self):
         """
@@ -532,6 +736,12 @@ class Whitebalance(Feature):
         dll.dc1394_feature_whitebalance_set_value(
                 self._cam, blue, red)
 
+    def _value_info(self, finfo):
+        return finfo.BU_value, finfo.RV_value
+
+    def _same_value(self, state, value):
+        return state.value == tuple(int(v) for v in value)
+
 
 class Temperature(Feature):
     @property
@@ -553,6 +763,12 @@ class Temperature(Feature):
         dll.dc1394_feature_temperature_set_value(
                 self._cam, setpoint)
 
+    def _value_info(self, finfo):
+        return finfo.target_value, finfo.value
+
+    def _same_value(self, state, value):
+        return state.value[0] == int(value)
+
 
 class Whiteshading(Feature):
     @property
@@ -568,9 +784,15 @@ class Whiteshading(Feature):
     @value.setter
     def value(self, value):
         red, green, blue = value
-        dll.dc1394_feature_temperature_set_value(
+        dll.dc1394_feature_whiteshading_set_value(
                 self._cam, int(red), int(green), int(blue))
 
+    def _value_info(self, finfo):
+        return finfo.R_value, finfo.G_value, finfo.B_value
+
+    def _same_value(self, state, value):
+        return state.value == tuple(int(v) for v in value)
+
 
 _feature_map = dict((n, Feature) for n in feature_codes)
 _feature_map["trigger"] = Trigger
@@ -579,6 +801,18 @@ _feature_map["white_balance"] = Whitebalance
 _feature_map["temperature"] = Temperature
 
 
+class ModeInfo(namedtuple("ModeInfo", [
+        "name", "image_size", "color_coding", "rates", "scalable"])):
+    """
+    An immutable record of the capabilities of a fixed :class:`Mode` as
+    returned by :attr:`Mode.info`.
+
+    The fields correspond to the attributes of the mode. ``rates`` is a
+    tuple.
+    """
+    __slots__ = ()
+
+
 class Mode(object):
     """
     A video mode for a DC1394 camera.
@@ -586,11 +820,50 @@ class Mode(object):
     Do not instantiate this class directly. Instead use one of the modes
     in :attr:`Camera.modes` or :attr:`Camera.modes_dict` and assign it to
     :attr:`Camera.mode`.
+
+    The capabilities of the mode (see :attr:`info`) are read once and
+    cached until the camera is reset (see :meth:`Camera.reset_camera`).
     """
 
     def __init__(self, cam, mode_id):
         self._mode_id = mode_id
         self._cam = cam
+        self._info = None
+
+    @property
+    def info(self):
+        """
+        The cached capabilities of this mode as a :class:`ModeInfo`.
+        Read-only.
+        """
+        if self._info is None:
+            self.refresh()
+        return self._info
+
+    def refresh(self):
+        """
+        Read the capabilities of this mode from the camera again.
+        """
+        fpss = framerates_t()
+        try:
+            dll.dc1394_video_get_supported_framerates(
+                    self._cam, self._mode_id, byref(fpss))
+        except DC1394Error:
+            rates = ()
+        else:
+            rates = tuple(framerate_vals[i]
+                    for i in fpss.framerates[:fpss.num])
+        w = c_uint32()
+        h = c_uint32()
+        dll.dc1394_get_image_size_from_video_mode(
+                self._cam, self._mode_id, byref(w), byref(h))
+        cc = color_coding_t()
+        dll.dc1394_get_color_coding_from_video_mode(
+                self._cam, self._mode_id, byref(cc))
+        self._info = ModeInfo(self.name, (w.value, h.value),
+                color_coding_vals[cc.value],
+                rates, bool(dll.dc1394_is_video_mode_scalable(
+                    self._mode_id)))
 
     @property
     def mode_id(self):
@@ -612,32 +885,21 @@ class Mode(object):
         """
         Allowed framerates if the camera is in this mode. Read-only.
         """
-        fpss = framerates_t()
-        dll.dc1394_video_get_supported_framerates(
-                self._cam, self._mode_id, byref(fpss))
-        return [framerate_vals[i]
-                for i in fpss.framerates[:fpss.num]]
+        return list(self.info.rates)
 
     @property
     def image_size(self):
         """
         The size in pixels of frames acquired in this mode. Read-only.
         """
-        w = c_uint32()
-        h = c_uint32()
-        dll.dc1394_get_image_size_from_video_mode(
-                self._cam, self._mode_id, byref(w), byref(h))
-        return w.value, h.value
+        return self.info.image_size
 
     @property
     def color_coding(self):
         """
         The type of color coding of pixels. Read-only.
         """
-        cc = color_coding_t()
-        dll.dc1394_get_color_coding_from_video_mode(
-                self._cam, self._mode_id, byref(cc))
-        return color_coding_vals[cc.value]
+        return self.info.color_coding
 
     @property
     def scalable(self):
@@ -649,18 +911,52 @@ class Mode(object):
     @property
     def dtype(self):
         """
-        A suitable numpy dtype string for the image array data.
-        Read-only.
+        A suitable numpy dtype string for the image array data as
+        delivered by the camera (big endian). Read-only.
+
+        See :meth:`pydc1394.frame.Frame.to_native` for native byte
+        order.
         """
-        if self.color_coding.endswith("16"):
+        if self.color_coding.endswith("16S"):
+            return ">i2"
+        elif self.color_coding.endswith("16"):
             return ">u2"
         else:
-            return ">u1"
+            return "u1"
 
 class Exif(Mode):
     pass
 
 
+class Format7Info(namedtuple("Format7Info", [
+        "max_image_size", "unit_size", "unit_position", "color_codings",
+        "color_filter"])):
+    """
+    An immutable record of the static capabilities of a :class:`Format7`
+    mode as returned by :attr:`Format7.info`.
+
+    The fields correspond to the attributes of the mode. ``color_codings``
+    is a tuple and ``color_filter`` is ``None`` for cameras without a
+    Bayer pattern. The packet parameters are not included as they
+    change with the ROI (see :attr:`Format7.packet_parameters`).
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_mode(cls, mode):
+        """
+        The record for the :class:`pydc1394.dc1394.format7mode_t`
+        ``mode``.
+        """
+        codings = mode.color_codings
+        return cls((mode.max_size_x, mode.max_size_y),
+                (mode.unit_size_x, mode.unit_size_y),
+                (mode.unit_pos_x, mode.unit_pos_y),
+                tuple(color_coding_vals[i]
+                    for i in codings.codings[:codings.num]),
+                color_filter_vals.get(mode.color_filter))
+
+
 class Format7(Mode):
     """
     Format7 modes are flexible modes that support:
@@ -682,9 +978,43 @@ class Format7(Mode):
     :attr:`packet_size` or all of them via the :attr:`roi` attribute
     or with a call to :meth:`setup`.
 
+    The static capabilities of the mode (see :class:`Format7Info`) are
+    read once and cached. Use :meth:`refresh` to read them again.
+
     All settings are sent to the hardware right away.
     """
 
+    def __init__(self, cam, mode_id, info=None):
+        super(Format7, self).__init__(cam, mode_id)
+        self._info = info
+
+    @property
+    def rates(self):
+        """
+        Format7 modes have no standard framerates (see
+        :attr:`frame_interval`). Read-only.
+        """
+        return []
+
+    @property
+    def info(self):
+        """
+        The cached static capabilities of this mode as a
+        :class:`Format7Info`. Read-only.
+        """
+        if self._info is None:
+            self.refresh()
+        return self._info
+
+    def refresh(self):
+        """
+        Read the static capabilities of this mode from the camera again.
+        """
+        mode = format7mode_t()
+        dll.dc1394_format7_get_mode_info(self._cam, self._mode_id,
+                byref(mode))
+        self._info = Format7Info.from_mode(mode)
+
     @property
     def frame_interval(self):
         """
@@ -705,12 +1035,7 @@ class Format7(Mode):
         The maximum size (horizontal and vertical) of the ROI in pixels.
         Read-only.
         """
-        hsize = c_uint32()
-        vsize = c_uint32()
-        dll.dc1394_format7_get_max_image_size(
-                self._cam, self._mode_id,
-                byref(hsize), byref(vsize))
-        return hsize.value, vsize.value
+        return self.info.max_image_size
 
     @property
     def image_size(self):
@@ -762,12 +1087,7 @@ class Format7(Mode):
         """
         Allowed color codings in this mode. Read-only.
         """
-        pos_codings = color_codings_t()
-        dll.dc1394_format7_get_color_codings(
-                self._cam, self._mode_id,
-                byref(pos_codings))
-        return [color_coding_vals[i]
-                for i in pos_codings.codings[:pos_codings.num]]
+        return list(self.info.color_codings)
 
     @property
     def color_coding(self):
@@ -791,24 +1111,14 @@ class Format7(Mode):
         Horizontal and vertical :attr:`image_position` multiples.
         Read-only.
         """
-        h_unit = c_uint32()
-        v_unit = c_uint32()
-        dll.dc1394_format7_get_unit_position(
-                self._cam, self._mode_id,
-                byref(h_unit), byref(v_unit))
-        return h_unit.value, v_unit.value
+        return self.info.unit_position
 
     @property
     def unit_size(self):
         """
         Horizontal and vertical :attr:`image_size` multiples. Read-only.
         """
-        h_unit = c_uint32()
-        v_unit = c_uint32()
-        dll.dc1394_format7_get_unit_size(
-                self._cam, self._mode_id,
-                byref(h_unit), byref(v_unit))
-        return h_unit.value, v_unit.value
+        return self.info.unit_size
 
     @property
     def roi(self):
@@ -823,6 +1133,11 @@ class Format7(Mode):
         * USE_MAX_AVAIL will (-2) set the value to its maximum and
         * USE_RECOMMENDED (-3) can be used for the bytes-per-packet
           setting.
+
+        Explicit sizes, positions and color codings are validated
+        against the cached capabilities (see :attr:`info`) and a
+        :class:`ValueError` is raised if they do not fit. The packet
+        size is checked by the camera as its limits depend on the ROI.
         """
         w, h, x, y = c_int32(), c_int32(), c_int32(), c_int32()
         cco, packet_size = color_coding_t(), c_int32()
@@ -835,9 +1150,40 @@ class Format7(Mode):
     @roi.setter
     def roi(self, args):
         size, position, color, packet_size = args
+        self._check_roi(size, position, color, packet_size)
+        if color != QUERY_FROM_CAMERA:
+            color = color_coding_codes[color]
         dll.dc1394_format7_set_roi(
-            self._cam, self._mode_id, color_coding_codes[color],
-            packet_size, position[0], position[1], size[0], size[1])
+            self._cam, self._mode_id, color, packet_size,
+            position[0], position[1], size[0], size[1])
+
+    def _check_roi(self, size, position, color, packet_size):
+        """
+        Raise a :class:`ValueError` if the explicit (non-negative) ROI
+        parameters are not supported by this mode. The packet size is
+        not checked.
+        """
+        info = self.info
+        for i in range(2):
+            if size[i] >= 0 and (size[i] < info.unit_size[i] or
+                    size[i] % (info.unit_size[i] or 1) or
+                    size[i] > info.max_image_size[i]):
+                raise ValueError("image size %r is not a multiple of %r "
+                        "up to %r" % (tuple(size), info.unit_size,
+                            info.max_image_size))
+            if position[i] >= 0 and (info.unit_position[i] and
+                    position[i] % info.unit_position[i] or
+                    position[i] > info.max_image_size[i]):
+                raise ValueError("image position %r is not a multiple of "
+                        "%r" % (tuple(position), info.unit_position))
+            if size[i] >= 0 and position[i] >= 0 and (
+                    size[i] + position[i] > info.max_image_size[i]):
+                raise ValueError("the ROI exceeds the maximum image size "
+                        "%r" % (info.max_image_size,))
+        if color != QUERY_FROM_CAMERA and color_coding_vals.get(
+                color_coding_codes.get(color)) not in info.color_codings:
+            raise ValueError("color coding %r not in %r" % (color,
+                info.color_codings))
 
     @property
     def recommended_packet_size(self):
@@ -857,6 +1203,8 @@ class Format7(Mode):
         Get the parameters of the packet size: its maximal size and its
         unit size. The packet size is always a multiple of the unit
         bytes and cannot be zero.
+
+        Both depend on the current ROI and are read from the camera.
         """
         packet_size_max = c_uint32()
         packet_size_unit = c_uint32()
@@ -921,19 +1269,52 @@ class Format7(Mode):
         Setup this Format7 mode.
         
         Similar to setting :attr:`roi` but size and position are made
-        multiples of :attr:`unit_size` and :attr:`unit_position`. All
-        arguments are optional and default to not changing the current
-        value. :attr:`packet_size` is set to the recommended value.
-        """
-        wu, hu = self.unit_size
-        xu, yu = self.unit_position
-        position = xu*int(image_position[0]/xu), yu*int(image_position[1]/yu)
-        size = wu*int(image_size[0]/wu), hu*int(image_size[1]/hu)
-        self.roi = size, position, color_coding, packet_size
+        multiples of :attr:`unit_size` and :attr:`unit_position` (within
+        :attr:`max_image_size`) and an explicit ``packet_size`` is made
+        a multiple of the packet unit. All arguments are optional and
+        default to not changing the current value. :attr:`packet_size`
+        is set to the recommended value.
+
+        The size and position are rounded using the cached
+        capabilities (see :attr:`info`). An explicit ``packet_size`` is
+        rounded using the :attr:`packet_parameters` of the new ROI
+        which are read from the camera after setting it.
+        """
+        info = self.info
+        size = [s if s < 0 else max(u, min(m, s)//(u or 1)*u)
+                for s, u, m in zip(image_size, info.unit_size,
+                    info.max_image_size)]
+        position = [p if p < 0 else p//(u or 1)*(u or 1)
+                for p, u in zip(image_position, info.unit_position)]
+        for i in range(2):
+            if size[i] >= 0 and position[i] >= 0:
+                over = size[i] + position[i] - info.max_image_size[i]
+                if over > 0:
+                    u = info.unit_position[i] or 1
+                    position[i] = max(0, position[i] - -(-over//u)*u)
+        if packet_size > 0:
+            self.roi = size, position, color_coding, USE_RECOMMENDED
+            unit, maximum = self.packet_parameters
+            if unit:
+                packet_size = max(unit, min(maximum, packet_size)//unit*unit)
+            self.packet_size = packet_size
+        else:
+            self.roi = size, position, color_coding, packet_size
         #return size, position, color_coding, packet_size
         return self.roi
 
 
+def _frame_bytes(image_size, color_coding):
+    """
+    The number of bytes of a frame of ``image_size`` pixels in
+    ``color_coding``.
+    """
+    bits = c_uint32()
+    dll.dc1394_get_color_coding_bit_size(color_coding_codes[color_coding],
+            byref(bits))
+    return -(-image_size[0]*image_size[1]*bits.value//8)
+
+
 _mode_map = {
        64: Mode,
        65: Mode,
@@ -970,6 +1351,22 @@ _mode_map = {
 }
 
 
+class _FrameStream(object):
+    """
+    Asynchronous iterator over the frames of a camera (see
+    :meth:`Camera.frames`).
+    """
+    def __init__(self, camera, loop=None):
+        self.camera = camera
+        self.loop = loop
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        return self.camera.next_frame(self.loop)
+
+
 class Camera(object):
     """
     This class represents a DC1394 Camera on the bus.
@@ -977,6 +1374,8 @@ class Camera(object):
 
     _cam = None
     _context = None
+    _clock = None
+    bufsize = None
 
     def __init__(self, guid=None, context=None, handle=None,
             iso_speed=None, mode=None, rate=None, **features):
@@ -1017,6 +1416,9 @@ class Camera(object):
         self._context = context
         self._cam = handle
 
+        # output buffers for the frame conversion methods
+        self.buffers = BufferPool()
+
         # setup static attributes of the camera
         self._features = self._load_features()
         self._modes, self._modes_dict = self._load_modes()
@@ -1082,9 +1484,11 @@ class Camera(object):
         re-enumerate (?).
         
         Call :meth:`close` after using this method as the camera handle
-        becomes invalid.
+        becomes invalid. The cached mode capabilities are discarded.
         """
         dll.dc1394_camera_reset(self._cam)
+        for mode in self._modes:
+            mode._info = None
 
     def memory_save(self, channel):
         """
@@ -1126,6 +1530,23 @@ class Camera(object):
         dll.dc1394_memory_busy(self._cam, byref(v))
         return bool(v.value)
 
+    def _dequeue(self, policy):
+        """
+        Dequeue a frame with the given capture policy and return the raw
+        ``video_frame_t`` pointer (which is false if there was none).
+        """
+        frame = POINTER(video_frame_t)()
+        dll.dc1394_capture_dequeue(self._cam, policy, byref(frame))
+        return frame
+
+    def _wait(self, timeout=None):
+        """
+        Wait up to ``timeout`` seconds (or indefinitely if ``None``)
+        for a frame to become available. Returns whether one is.
+        """
+        readable, _, _ = select.select([self.fileno], [], [], timeout)
+        return bool(readable)
+
     def flush(self):
         """
         Flush already acquired and transferred frames from the DMA
@@ -1133,16 +1554,13 @@ class Camera(object):
         
         These old frames would otherwise be returned by :meth:`dequeue`.
         """
-        frame = POINTER(video_frame_t)()
         while True:
-            dll.dc1394_capture_dequeue(self._cam,
-                    CAPTURE_POLICY_POLL, byref(frame))
-            if not bool(frame):
+            frame = self._dequeue(CAPTURE_POLICY_POLL)
+            if not frame:
                 break
-            dll.dc1394_capture_enqueue(self._cam,
-                    frame)
+            dll.dc1394_capture_enqueue(self._cam, frame)
 
-    def dequeue(self, poll=False):
+    def dequeue(self, poll=False, timeout=None):
         """
         Capture a frame.
 
@@ -1150,33 +1568,267 @@ class Camera(object):
         frame indefinitely (``poll=False``, the default) or return
         ``None`` immediately if no frame arrived yet (``poll=True``).
 
+        With a ``timeout`` (in seconds), wait at most that long for the
+        frame and return ``None`` if none arrived. The waiting is done
+        on :attr:`fileno` without using CPU. A frame that is already
+        available is returned without waiting.
+
         Release the returned frame as soon as possible via
         :meth:`pydc1394.frame.Frame.enqueue` to return it to the DMA buffer
         and recycle it.
+
+        The conversion methods of the frame (like
+        :meth:`pydc1394.frame.Frame.to_rgb`) take their output arrays
+        from :attr:`buffers`.
         """
-        frame = POINTER(video_frame_t)()
-        policy = poll and CAPTURE_POLICY_POLL or CAPTURE_POLICY_WAIT
-        dll.dc1394_capture_dequeue(self._cam,
-                policy, byref(frame))
-        if not bool(frame):
+        if poll or timeout is None:
+            frame = self._dequeue(poll and CAPTURE_POLICY_POLL or
+                    CAPTURE_POLICY_WAIT)
+        else:
+            frame = self._dequeue(CAPTURE_POLICY_POLL)
+            if not frame and self._wait(timeout):
+                frame = self._dequeue(CAPTURE_POLICY_POLL)
+        if not frame:
+            return
+        return Frame(self._cam, frame, self.buffers)
+
+    def dequeue_latest(self, wait=False):
+        """
+        Capture the most recent frame and recycle all older ones.
+
+        If no frame has arrived yet, wait for one if ``wait=True`` or
+        else return ``None``.
+
+        The older frames are dropped without wrapping them in
+        :class:`pydc1394.frame.Frame` instances. This is the cheapest
+        way to keep up with the camera for previews.
+        """
+        frame = self._dequeue(wait and CAPTURE_POLICY_WAIT or
+                CAPTURE_POLICY_POLL)
+        if not frame:
             return
-        return Frame(self._cam, frame)
+        while frame.contents.frames_behind:
+            newer = self._dequeue(CAPTURE_POLICY_POLL)
+            if not newer:
+                break
+            dll.dc1394_capture_enqueue(self._cam, frame)
+            frame = newer
+        return Frame(self._cam, frame, self.buffers)
+
+    def dequeue_many(self, n, timeout=None):
+        """
+        Capture ``n`` consecutive frames and return them as a list.
+
+        Wait up to ``timeout`` seconds (or indefinitely if ``None``) for
+        the frames to arrive. On timeout the list contains fewer frames.
+
+        Frames already in the DMA buffer (as indicated by
+        ``frames_behind``) are dequeued without waiting. Enqueue all
+        frames when done, and use fewer frames than the buffer size
+        passed to :meth:`start_capture`.
+        """
+        if timeout is not None:
+            deadline = monotonic() + timeout
+        frames = []
+        behind = 0
+        while len(frames) < n:
+            if behind: # known to be ready
+                policy = CAPTURE_POLICY_POLL
+            elif timeout is None:
+                policy = CAPTURE_POLICY_WAIT
+            elif self._wait(max(0, deadline - monotonic())):
+                policy = CAPTURE_POLICY_POLL
+            else:
+                break
+            frame = self._dequeue(policy)
+            if not frame:
+                behind = 0
+                continue
+            behind = frame.contents.frames_behind
+            frames.append(Frame(self._cam, frame, self.buffers))
+        return frames
+
+    def next_frame(self, loop=None):
+        """
+        Capture the next frame asynchronously.
+
+        Returns an :class:`asyncio.Future` (to be awaited) for the next
+        frame. Waiting is done by watching :attr:`fileno` with
+        ``loop.add_reader()`` so that one event loop can service many
+        cameras without acquisition threads. ``loop`` defaults to the
+        running event loop.
+
+        Only one frame can be awaited per camera at a time. Enqueue the
+        frames as with :meth:`dequeue`.
+        """
+        import asyncio
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except AttributeError: # python < 3.7
+                loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        frame = self.dequeue(poll=True)
+        if frame is not None:
+            future.set_result(frame)
+            return future
+        fd = self.fileno
+        def ready():
+            if future.done():
+                return
+            try:
+                frame = self.dequeue(poll=True)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                if frame is not None:
+                    future.set_result(frame)
+        loop.add_reader(fd, ready)
+        future.add_done_callback(lambda future: loop.remove_reader(fd))
+        return future
+
+    def frames(self, loop=None):
+        """
+        An asynchronous iterator over the captured frames::
+
+            async for frame in camera.frames():
+                process(frame)
+                frame.enqueue()
+
+        See :meth:`next_frame`.
+        """
+        return _FrameStream(self, loop)
+
+    def _frames(self, n, copy, timeout):
+        """
+        Generate up to ``n`` (or infinitely many if ``None``) frames
+        and enqueue each one when the consumer advances.
+        """
+        i = 0
+        while n is None or i < n:
+            frame = self.dequeue(timeout=timeout)
+            if frame is None:
+                return
+            i += 1
+            if copy:
+                img = frame.detach()
+                frame.enqueue()
+                yield img
+            else:
+                try:
+                    yield frame
+                finally:
+                    frame.enqueue()
+
+    @contextmanager
+    def stream(self, bufsize=4, mode="video", n=None, copy=False,
+            timeout=None):
+        """
+        Capture a stream of frames::
+
+            with camera.stream(mode="multi_shot", n=10) as frames:
+                for frame in frames:
+                    process(frame)
+
+        Sets up the capture with ring buffer size ``bufsize`` and starts
+        the transmission in ``mode`` ``"video"``, ``"multi_shot"`` (of
+        ``n`` frames) or ``"one_shot"``. Both are stopped again when
+        leaving the context.
+
+        The frames are generated as with :meth:`dequeue` and each one is
+        enqueued as soon as the next one is requested (or the loop is
+        left). Do not keep references to them. With ``copy=True``, the
+        frames are instead copied out of the DMA buffer (see
+        :meth:`pydc1394.frame.Frame.detach`) into arrays recycled by
+        :attr:`buffers` and the DMA buffer is enqueued immediately.
+
+        At most ``n`` frames are generated. The stream ends early if no
+        frame arrives within ``timeout`` seconds.
+        """
+        if mode == "one_shot":
+            start, stop, n = self.start_one_shot, self.stop_one_shot, 1
+        elif mode == "multi_shot":
+            if n is None:
+                raise ValueError("multi_shot needs the number of frames")
+            start = lambda: self.start_multi_shot(n)
+            stop = self.stop_multi_shot
+        elif mode == "video":
+            start, stop = self.start_video, self.stop_video
+        else:
+            raise ValueError("unknown mode %r" % mode)
+        self.start_capture(bufsize)
+        try:
+            self.flush()
+            start()
+            frames = self._frames(n, copy, timeout)
+            try:
+                yield frames
+            finally:
+                frames.close()
+                stop()
+        finally:
+            self.stop_capture()
+
+    # the size of the ring buffer above which the allocation may fail
+    _ring_limit = 30 << 20
+
+    def _frame_size(self):
+        """
+        The number of bytes per frame and the frame rate of the current
+        mode.
+        """
+        mode = self.mode
+        if isinstance(mode, Format7):
+            nbytes = mode.total_bytes
+            try:
+                rate = 1/mode.frame_interval
+            except (DC1394Error, ZeroDivisionError):
+                # limited by the bus (one packet per cycle)
+                rate = 8000/-(-nbytes//mode.packet_size)
+        else:
+            nbytes = _frame_bytes(mode.image_size, mode.color_coding)
+            rate = self.rate
+        return nbytes, rate
 
-    def start_capture(self, bufsize=4, capture_flags="DEFAULT"):
+    def start_capture(self, bufsize=4, capture_flags="DEFAULT",
+            latency=100):
         """
-        Setup the capture session.
+        Setup the capture session and return the number of images in
+        the ring buffer (also available as :attr:`bufsize`).
 
         ``bufsize`` is the number of images in the ring buffer. Thanks to
         some hack you can even set this parameter to 1 but the
         recommended value is between four to ten. If you request too much
         memory (above 30M) there is a chance that the function will fail.
 
+        With ``bufsize="auto"`` the ring buffer holds the frames arriving
+        within ``latency`` milliseconds (the longest time the consumer
+        may stall without losing frames) at the frame rate of the
+        current mode, plus one. It is kept below 30M and halved until
+        the allocation succeeds.
+
         Use ``capture_flags`` to setup bandwidth and channel allocation
         and to enable automatic start of iso transmission.
         """
-        dll.dc1394_capture_setup(
-                self._cam, bufsize,
-                capture_flag_codes_short[capture_flags])
+        flags = capture_flag_codes_short[capture_flags]
+        if bufsize != "auto":
+            dll.dc1394_capture_setup(self._cam, bufsize, flags)
+            self.bufsize = bufsize
+            return bufsize
+        nbytes, rate = self._frame_size()
+        bufsize = max(2, int(-(-rate*latency//1e3)) + 1)
+        bufsize = max(1, min(bufsize, self._ring_limit//max(nbytes, 1)))
+        while True:
+            try:
+                dll.dc1394_capture_setup(self._cam, bufsize, flags)
+            except DC1394Error as e:
+                if (e.errval != error_codes["MEMORY_ALLOCATION_FAILURE"]
+                        or bufsize == 1):
+                    raise
+                bufsize //= 2
+            else:
+                self.bufsize = bufsize
+                return bufsize
 
     def stop_capture(self):
         """
@@ -1196,6 +1848,16 @@ class Camera(object):
         """
         dll.dc1394_video_set_transmission(self._cam, 0)
 
+    @property
+    def transmitting(self):
+        """
+        Is the camera transmitting frames (see :meth:`start_video`)?
+        Read-only.
+        """
+        on = switch_t()
+        dll.dc1394_video_get_transmission(self._cam, byref(on))
+        return bool(on.value)
+
     def start_one_shot(self):
         """
         Instruct the camera to acquire and transmit exactly one frame.
@@ -1258,6 +1920,22 @@ class Camera(object):
         """
         return self._features
 
+    def feature_snapshot(self):
+        """
+        The complete state of all available features as a dictionary of
+        :class:`FeatureInfo` records by feature name, obtained with a
+        single call to libdc1394.
+        """
+        fs = featureset_t()
+        dll.dc1394_feature_get_all(self._cam, byref(fs))
+        snapshot = {}
+        for i in range(FEATURE_NUM):
+            finfo = fs.feature[i]
+            if finfo.available:
+                name = feature_vals[finfo.id]
+                snapshot[name] = self._features[name]._info(finfo)
+        return snapshot
+
     def setup(self, active=True, mode="manual", absolute=True,
             **features):
         """
@@ -1266,9 +1944,17 @@ class Camera(object):
         Pass all features and the values to set as additional keyword
         arguments. By default the specified features are activated, set
         to ``manual`` and ``absolute`` mode.
+
+        The current state of all features is read with
+        :meth:`feature_snapshot` and only the differing properties are
+        written (see :meth:`Feature.setup`). Returns a dictionary of the
+        properties written by feature name.
         """
-        for k, v in features.items():
-            self.features[k].setup(v, active, mode, absolute)
+        if not features:
+            return {}
+        snapshot = self.feature_snapshot()
+        return dict((k, self.features[k].setup(v, active, mode, absolute,
+            state=snapshot[k])) for k, v in features.items())
 
     def _load_modes(self):
         """
@@ -1279,6 +1965,19 @@ class Camera(object):
         dll.dc1394_video_get_supported_modes(self._cam, byref(modes))
         modes = [_mode_map[i](self._cam, i)
                 for i in modes.modes[:modes.num]]
+        format7 = [m for m in modes if isinstance(m, Format7)]
+        if format7:
+            # all format7 capabilities in one go
+            modeset = format7modeset_t()
+            try:
+                dll.dc1394_format7_get_modeset(self._cam, byref(modeset))
+            except DC1394Error:
+                pass # read lazily per mode
+            else:
+                for m in format7:
+                    mode = modeset.mode[m.mode_id - VIDEO_MODE_FORMAT7_MIN]
+                    if mode.present:
+                        m._info = Format7Info.from_mode(mode)
         modes_dict = dict((m.name, m) for m in modes)
         return modes, modes_dict
 
@@ -1296,6 +1995,55 @@ class Camera(object):
         """
         return self._modes_dict
 
+    def find_modes(self, image_size=None, color_coding=None, rate=None,
+            scalable=None):
+        """
+        The supported modes (in the order of :attr:`modes`) that can
+        deliver images of ``image_size`` (width and height in pixels)
+        with ``color_coding`` at ``rate`` and that are ``scalable`` (all
+        if ``None``).
+
+        :class:`Format7` modes match any size that is a multiple of
+        their unit size within their maximum size and any of their
+        color codings. Only fixed modes have standard rates.
+
+        The cached capabilities (see :attr:`Mode.info`) are used and
+        the camera is only queried the first time.
+        """
+        if color_coding is not None:
+            color_coding = color_coding_vals[color_coding_codes[
+                color_coding]]
+        modes = []
+        for mode in self._modes:
+            if isinstance(mode, Format7):
+                info = mode.info
+                if scalable is False or rate is not None:
+                    continue
+                if image_size is not None and not all(
+                        u <= s <= m and not s % u for s, u, m in zip(
+                            image_size, info.unit_size,
+                            info.max_image_size)):
+                    continue
+                if (color_coding is not None and
+                        color_coding not in info.color_codings):
+                    continue
+            elif isinstance(mode, Exif):
+                continue
+            else:
+                info = mode.info
+                if scalable is not None and info.scalable != scalable:
+                    continue
+                if (image_size is not None and
+                        info.image_size != tuple(image_size)):
+                    continue
+                if (color_coding is not None and
+                        info.color_coding != color_coding):
+                    continue
+                if rate is not None and rate not in info.rates:
+                    continue
+            modes.append(mode)
+        return modes
+
     def get_register(self, offset):
         """
         Returns the current value of the register at address ``offset``.
@@ -1313,11 +2061,75 @@ class Camera(object):
         dll.dc1394_set_control_registers(
                 self._cam, offset, byref(val), 1)
 
+    # libdc1394 functions to access the register address spaces
+    _register_functions = {
+        "control": ("dc1394_get_control_registers",
+            "dc1394_set_control_registers"),
+        "adv": ("dc1394_get_adv_control_registers",
+            "dc1394_set_adv_control_registers"),
+        "raw": ("dc1394_get_registers", "dc1394_set_registers"),
+    }
+    # quadlets per block transaction (512 bytes fit any bus speed)
+    _register_block = 128
+
+    def _transfer_registers(self, i, offset, vals, space):
+        try:
+            func = getattr(dll, self._register_functions[space][i])
+        except KeyError:
+            raise ValueError("unknown register space %r" % space)
+        for j in range(0, len(vals), self._register_block):
+            block = vals[j:j + self._register_block]
+            func(self._cam, offset + 4*j,
+                    block.ctypes.data_as(POINTER(c_uint32)), len(block))
+
+    def get_registers(self, offset, count, space="control"):
+        """
+        Returns the values of the ``count`` consecutive registers
+        starting at address ``offset`` as a ``uint32`` array.
+
+        The registers are read in blocks of up to 128 quadlets.
+        ``space`` is the address space: ``"control"`` (relative to the
+        IIDC command registers, like :meth:`get_register`), ``"adv"``
+        (relative to the advanced feature registers) or ``"raw"``
+        (relative to the configuration ROM base).
+        """
+        vals = empty(count, uint32)
+        self._transfer_registers(0, offset, vals, space)
+        return vals
+
+    def set_registers(self, offset, values, space="control"):
+        """
+        Set the consecutive registers starting at ``offset`` to
+        ``values``. See :meth:`get_registers`.
+        """
+        vals = ascontiguousarray(values, uint32).reshape(-1)
+        self._transfer_registers(1, offset, vals, space)
+
+    def _register_slice(self, key):
+        if key.start is None or key.stop is None:
+            raise ValueError("register slices need an explicit start and "
+                    "stop")
+        if key.step not in (None, 4):
+            raise ValueError("registers are four bytes apart")
+        return key.start, (key.stop - key.start)//4
+
     # shortcuts for getting and setting registers.
     # these make toggling bits simpler (cam[0x100] |= 1<<6 versus
-    # cam.set_register(0x100, cam.get_register(0x100) | (1<<6)))
-    __getitem__ = get_register
-    __setitem__ = set_register
+    # cam.set_register(0x100, cam.get_register(0x100) | (1<<6))).
+    # slices transfer blocks: cam[0x1d00:0x1e00]
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.get_registers(*self._register_slice(key))
+        return self.get_register(key)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            offset, count = self._register_slice(key)
+            vals = empty(count, uint32)
+            vals[:] = value
+            self.set_registers(offset, vals)
+        else:
+            self.set_register(key, value)
 
     @property
     def broadcast(self):
@@ -1550,3 +2362,86 @@ class Camera(object):
         dll.dc1394_camera_get_node(self._cam, byref(node),
                 byref(generation))
         return node.value, generation.value
+
+    def read_cycle_timer(self):
+        """
+        Read the cycle timer of the IEEE 1394 bus the camera is on.
+
+        Returns the 32 bit cycle timer value (7 bits seconds, 13 bits
+        cycles of 125 us, 12 bits ticks of 24.576 MHz) and the host time
+        it was read at (in microseconds since the epoch, like
+        :attr:`pydc1394.frame.Frame.timestamp`).
+        """
+        cycle_timer, local_time = c_uint32(), c_uint64()
+        dll.dc1394_read_cycle_timer(self._cam, byref(cycle_timer),
+                byref(local_time))
+        return cycle_timer.value, local_time.value
+
+    @property
+    def embedded_info(self):
+        """
+        The list of fields of information embedded in the first pixels
+        of each frame (see :data:`pydc1394.embedded.embedded_fields`).
+
+        Assign a list of field names to enable them (and disable the
+        others). Raises a :class:`DC1394Exception` if the camera does
+        not support embedded information. Use :meth:`decode_embedded` to
+        extract the information from the frames.
+        """
+        reg = self.get_register(EMBEDDED_INFO_REGISTER)
+        if not reg >> 31:
+            raise DC1394Exception("embedded image info not supported")
+        return [name for i, name in enumerate(embedded_fields)
+                if reg & (1 << i)]
+
+    @embedded_info.setter
+    def embedded_info(self, fields):
+        reg = self.get_register(EMBEDDED_INFO_REGISTER)
+        if not reg >> 31:
+            raise DC1394Exception("embedded image info not supported")
+        unknown = set(fields) - set(embedded_fields)
+        if unknown:
+            raise ValueError("unknown fields %s" % ", ".join(unknown))
+        mask = sum(1 << i for i, name in enumerate(embedded_fields)
+                if name in fields)
+        self.set_register(EMBEDDED_INFO_REGISTER,
+                (reg & ~0x3ff & 0xffffffff) | mask)
+        self._embedded_fields = [name for name in embedded_fields
+                if name in fields]
+
+    _embedded_fields = None
+
+    def decode_embedded(self, frames, annotate=True):
+        """
+        Decode the embedded information of a batch of ``frames`` into
+        a structured array and attach each record to its frame as
+        ``frame.embedded`` (see
+        :func:`pydc1394.embedded.decode_embedded`).
+
+        The enabled fields are those last assigned to
+        :attr:`embedded_info` (or read once from the camera). If
+        ``annotate=True`` and the timestamp is embedded, the frames are
+        also annotated with host and bus time of the start of the
+        exposure by :attr:`clock`. Frames without metadata (like the
+        rows of a stacked array) are not annotated.
+        """
+        if self._embedded_fields is None:
+            self._embedded_fields = self.embedded_info
+        info = decode_embedded(frames, self._embedded_fields)
+        if annotate and "timestamp" in self._embedded_fields:
+            for frame, cycle_timer in zip(frames,
+                    info["timestamp"].tolist()):
+                if getattr(frame, "metadata", None) is not None:
+                    self.clock.annotate(frame, cycle_timer)
+        return info
+
+    @property
+    def clock(self):
+        """
+        The :class:`pydc1394.clock.CycleClock` model of this camera's bus
+        time. Use ``camera.clock.annotate(frame)`` to add host and bus
+        time stamps to frames. Read-only.
+        """
+        if self._clock is None:
+            self._clock = CycleClock(self)
+        return self._clock
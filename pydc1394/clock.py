@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Relating the IEEE1394 bus clock to host time.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+from collections import deque
+try:
+    from time import monotonic
+except ImportError: # python 2
+    from time import time as monotonic
+
+
+__all__ = ["CycleClock", "cycle_timer_seconds"]
+
+
+# the cycle timer counts 128 seconds of 8000 cycles of 3072 ticks
+CYCLE_TIMER_WRAP = 128
+CYCLES_PER_SECOND = 8000
+TICKS_PER_CYCLE = 3072
+
+
+def cycle_timer_seconds(cycle_timer):
+    """
+    The time in seconds (modulo 128) represented by the 32 bit cycle
+    timer value ``cycle_timer`` (7 bits seconds, 13 bits cycles, 12 bits
+    ticks of 24.576 MHz).
+    """
+    return ((cycle_timer >> 25) + ((cycle_timer >> 12) & 0x1fff)/
+            CYCLES_PER_SECOND + (cycle_timer & 0xfff)/
+            (CYCLES_PER_SECOND*TICKS_PER_CYCLE))
+
+
+class CycleClock(object):
+    """
+    A model of the bus time of a camera in terms of host time.
+
+    The cycle timer of the camera's bus is sampled together with the
+    host time (see :meth:`pydc1394.camera2.Camera.read_cycle_timer`)
+    at least every ``interval`` seconds when frames are annotated. The
+    offset and drift between the two clocks are fitted over the last
+    ``window`` samples. The bus time is unwrapped (it wraps every 128
+    seconds) to a continuous time since the first sample's wrap.
+
+    Use :meth:`annotate` to add host and bus time stamps to frames.
+    """
+
+    def __init__(self, camera, window=32, interval=1.):
+        self.camera = camera
+        self.interval = interval
+        self._samples = deque(maxlen=window)
+        self._fit = None
+        self._sampled = None
+
+    def _unwrap(self, seconds, host):
+        """
+        Unwrap the bus time ``seconds`` (modulo 128) to the wrap closest
+        to the bus time expected at host time ``host``.
+        """
+        if not self._samples:
+            return seconds
+        expected = self.bus_time(host)
+        return seconds + round((expected - seconds)/CYCLE_TIMER_WRAP
+                )*CYCLE_TIMER_WRAP
+
+    def sample(self):
+        """
+        Read the cycle timer and update the model.
+        """
+        cycle_timer, local_time = self.camera.read_cycle_timer()
+        host = local_time*1e-6
+        bus = self._unwrap(cycle_timer_seconds(cycle_timer), host)
+        self._samples.append((bus, host))
+        self._fit = None
+        self._sampled = monotonic()
+
+    @property
+    def fit(self):
+        """
+        The model as a tuple of the mean bus time, the mean host time
+        (both in seconds) and the rate of host time per bus time.
+        """
+        if self._fit is None:
+            if not self._samples:
+                self.sample()
+            n = len(self._samples)
+            bus0 = sum(b for b, h in self._samples)/n
+            host0 = sum(h for b, h in self._samples)/n
+            var = sum((b - bus0)**2 for b, h in self._samples)
+            cov = sum((b - bus0)*(h - host0) for b, h in self._samples)
+            self._fit = bus0, host0, var and cov/var or 1.
+        return self._fit
+
+    def host_time(self, bus):
+        """
+        The host time (in seconds since the epoch) for the (unwrapped)
+        bus time ``bus``.
+        """
+        bus0, host0, rate = self.fit
+        return host0 + (bus - bus0)*rate
+
+    def bus_time(self, host):
+        """
+        The unwrapped bus time for the host time ``host``.
+        """
+        bus0, host0, rate = self.fit
+        return bus0 + (host - host0)/rate
+
+    def annotate(self, frame, cycle_timer=None):
+        """
+        Add the attributes ``host_time`` (in seconds since the epoch)
+        and ``cycle_count`` (the unwrapped number of bus cycles) to
+        ``frame``.
+
+        If the cycle timer value at the start of the exposure or
+        transmission ``cycle_timer`` is known (e.g. from the embedded
+        image information), the host time is derived from it. This
+        aligns frames of cameras on the same bus to the precision of
+        the bus clock. Otherwise the cycle count is derived from the
+        :attr:`pydc1394.frame.Frame.timestamp` of the frame.
+        """
+        if self._sampled is None or monotonic() - self._sampled > \
+                self.interval:
+            self.sample()
+        timestamp = frame.timestamp*1e-6
+        if cycle_timer is None:
+            host = timestamp
+            bus = self.bus_time(host)
+        else:
+            bus = self._unwrap(cycle_timer_seconds(cycle_timer), timestamp)
+            host = self.host_time(bus)
+        frame.host_time = host
+        frame.cycle_count = int(bus*CYCLES_PER_SECOND)
+        return frame
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Image conversions.
+
+Unlike the libdc1394 converters these work on arbitrary (row-strided)
+views and crops and can process an image in tiles on a thread pool
+(numpy and ctypes release the GIL while they work).
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+import atexit
+from ctypes import POINTER, c_uint8
+
+from numpy import (arange, empty, take, clip, int32, uint8,
+        ascontiguousarray, copyto)
+
+from .dc1394 import (dll, byte_order_vals_short, color_filter_codes,
+        bayer_method_codes_short, stereo_method_vals_short)
+
+
+__all__ = ["yuv_to_rgb", "debayer", "split_stereo"]
+
+
+# Fixed point (10 bit) YUV to RGB coefficients as used by libdc1394:
+#   r = y + ((v*1436) >> 10)
+#   g = y - ((u*352 + v*731) >> 10)
+#   b = y + ((u*1814) >> 10)
+# with u and v offset by -128. The products are tabulated for all byte
+# values so that the conversion is a table lookup, an add and a shift.
+_chroma = arange(256, dtype=int32) - 128
+_rv = (_chroma*1436) >> 10
+_gu = _chroma*352
+_gv = _chroma*731
+_bu = (_chroma*1814) >> 10
+del _chroma
+
+
+def _yuv(y, u, v, out):
+    """
+    Convert the luma and chroma byte arrays ``y``, ``u``, ``v`` (of
+    equal shape) into the RGB array ``out`` (with an additional last
+    axis).
+    """
+    y = y.astype(int32)
+    tmp = take(_rv, v)
+    tmp += y
+    out[..., 0] = clip(tmp, 0, 255, out=tmp)
+    tmp = take(_gu, u)
+    tmp += take(_gv, v)
+    tmp >>= 10
+    tmp -= y
+    tmp *= -1
+    out[..., 1] = clip(tmp, 0, 255, out=tmp)
+    tmp = take(_bu, u)
+    tmp += y
+    out[..., 2] = clip(tmp, 0, 255, out=tmp)
+
+
+def _yuv444(src, out, byte_order):
+    _yuv(src[:, 1::3], src[:, 0::3], src[:, 2::3], out)
+
+
+def _yuv422(src, out, byte_order):
+    if byte_order == "UYVY":
+        u, y0, v, y1 = src[:, 0::4], src[:, 1::4], src[:, 2::4], src[:, 3::4]
+    else: # YUYV
+        y0, u, y1, v = src[:, 0::4], src[:, 1::4], src[:, 2::4], src[:, 3::4]
+    _yuv(y0, u, v, out[:, 0::2])
+    _yuv(y1, u, v, out[:, 1::2])
+
+
+def _yuv411(src, out, byte_order):
+    # UYYVYY
+    u, v = src[:, 0::6], src[:, 3::6]
+    for i, j in enumerate((1, 2, 4, 5)):
+        _yuv(src[:, j::6], u, v, out[:, i::4])
+
+
+# converter, bytes per macro pixel, pixels per macro pixel
+_yuv_codings = {
+        "YUV444": (_yuv444, 3, 1),
+        "YUV422": (_yuv422, 4, 2),
+        "YUV411": (_yuv411, 6, 4),
+}
+
+
+_thread_pools = {}
+
+
+@atexit.register
+def _close_thread_pools():
+    for pool in _thread_pools.values():
+        pool.terminate()
+    _thread_pools.clear()
+
+
+def _thread_pool(threads):
+    """
+    A shared pool of ``threads`` worker threads.
+    """
+    try:
+        return _thread_pools[threads]
+    except KeyError:
+        from multiprocessing.pool import ThreadPool
+        pool = _thread_pools[threads] = ThreadPool(threads)
+        return pool
+
+
+def _tiles(height, threads, align=1):
+    """
+    Split ``height`` rows into about ``threads`` slices whose starts
+    are multiples of ``align``.
+    """
+    step = -(-height//threads)
+    step += -step % align
+    return [slice(i, min(i + step, height)) for i in range(0, height, step)]
+
+
+def _map_tiles(func, height, threads, align=1):
+    """
+    Call ``func(rows)`` for horizontal tiles of the image, in parallel
+    if ``threads > 1``.
+    """
+    if threads is None or threads <= 1:
+        func(slice(None))
+        return
+    _thread_pool(threads).map(func, _tiles(height, threads, align))
+
+
+def yuv_to_rgb(src, color_coding, byte_order="UYVY", out=None,
+        threads=None):
+    """
+    Convert YUV image data to RGB8.
+
+    ``src`` is a ``uint8`` array with one image line per row (the
+    remaining axes are flattened). It can be any view or crop as long as
+    the bytes of a line are contiguous and the crop is aligned to whole
+    macro pixels (two pixels for ``"YUV422"`` and four for
+    ``"YUV411"``). ``color_coding`` is one of ``"YUV444"``,
+    ``"YUV422"`` or ``"YUV411"`` and ``byte_order`` is either
+    ``"UYVY"`` or ``"YUYV"`` (or the respective libdc1394 code, like
+    :attr:`pydc1394.frame.Frame.yuv_byte_order`). It only applies to
+    ``"YUV422"``.
+
+    The result is written into ``out`` if given, which must be a
+    ``uint8`` array of shape ``(height, width, 3)``. The coefficients
+    are the integer fixed point coefficients of libdc1394 and the
+    results are identical.
+
+    If ``threads > 1``, the image is converted in horizontal tiles on a
+    pool of that many threads.
+    """
+    try:
+        func, nbytes, npixels = _yuv_codings[color_coding]
+    except KeyError:
+        raise ValueError("unsupported color coding %r" % color_coding)
+    byte_order = byte_order_vals_short.get(byte_order, byte_order)
+    if byte_order not in ("UYVY", "YUYV"):
+        raise ValueError("unsupported byte order %r" % byte_order)
+    src = src.reshape(src.shape[0], -1)
+    height, width = src.shape
+    if width % nbytes:
+        raise ValueError("the lines must consist of whole macro pixels "
+                "(%i bytes)" % nbytes)
+    shape = height, width//nbytes*npixels, 3
+    if out is None:
+        out = empty(shape, uint8)
+    elif out.shape != shape:
+        raise ValueError("out must be of shape %s" % (shape,))
+    def convert(rows):
+        func(src[rows], out[rows], byte_order)
+    _map_tiles(convert, height, threads)
+    return out
+
+
+def _pointer(a):
+    return a.ctypes.data_as(POINTER(c_uint8))
+
+
+def debayer(src, color_filter, method="BILINEAR", bits=None, out=None,
+        threads=None, overlap=16):
+    """
+    Demosaic the Bayer pattern image ``src`` using libdc1394.
+
+    ``src`` is a two dimensional ``uint8`` or ``uint16`` array (of any
+    byte order). ``color_filter`` is the arrangement of the pattern,
+    one of ``"RGGB"``, ``"GBRG"``, ``"GRBG"``, ``"BGGR"`` or the
+    respective libdc1394 code (like
+    :attr:`pydc1394.frame.Frame.color_filter`). ``method`` is one of
+    the methods in :data:`pydc1394.dc1394.bayer_method_codes_short`
+    like ``"NEAREST"``, ``"BILINEAR"``, ``"HQLINEAR"`` or ``"AHD"``.
+    ``bits`` is the data depth of 16 bit images (defaults to 16).
+
+    The result is a ``(height, width, 3)`` RGB array of the same item
+    size (and native byte order) as ``src``, half the size in each
+    direction for ``"DOWNSAMPLE"``. It is written into ``out`` if
+    given.
+
+    If ``threads > 1``, the image is decoded in horizontal strips on a
+    pool of that many threads. Each strip is extended by ``overlap``
+    rows on either side to avoid artifacts at the strip borders. The
+    overlap needs to cover the neighborhood used by the method.
+    """
+    filt = color_filter_codes.get(color_filter, color_filter)
+    meth = bayer_method_codes_short.get(method, method)
+    if src.ndim != 2:
+        raise ValueError("src must be two dimensional")
+    height, width = src.shape
+    if src.dtype.itemsize == 1:
+        src = ascontiguousarray(src, uint8)
+        func, args = dll.dc1394_bayer_decoding_8bit, ()
+    else:
+        src = ascontiguousarray(src, "=u2")
+        func, args = dll.dc1394_bayer_decoding_16bit, (bits or 16,)
+    if meth == bayer_method_codes_short["DOWNSAMPLE"]:
+        shape = height//2, width//2, 3
+        threads = None
+    else:
+        shape = height, width, 3
+    if out is None:
+        out = empty(shape, src.dtype)
+    elif (out.shape != shape or out.dtype != src.dtype or
+            not out.flags.c_contiguous):
+        raise ValueError("out must be a C-contiguous %s array of shape %s"
+                % (src.dtype, shape))
+    if threads is None or threads <= 1:
+        func(_pointer(src), _pointer(out), width, height, filt, meth,
+                *args)
+        return out
+    overlap += overlap % 2 # keep the phase of the pattern
+    def decode(rows):
+        start = max(rows.start - overlap, 0)
+        stop = min(rows.stop + overlap, height)
+        strip = empty((stop - start, width, 3), src.dtype)
+        func(_pointer(src[start:stop]), _pointer(strip), width,
+                stop - start, filt, meth, *args)
+        out[rows] = strip[rows.start - start:rows.stop - start]
+    _map_tiles(decode, height, threads, align=2)
+    return out
+
+
+def split_stereo(src, method="INTERLACED", out=None, engine="numpy"):
+    """
+    Split the 16 bit image ``src`` of a stereo camera into the two 8 bit
+    images of its units.
+
+    With ``method="INTERLACED"`` the two bytes of each pixel belong to
+    the first and second image respectively. With ``method="FIELD"`` the
+    first and second half of the data are the two images. ``method`` can
+    also be the libdc1394 code.
+
+    The result is a ``uint8`` array of shape ``(2, height, width)``
+    written into ``out`` if given. ``engine`` is either ``"numpy"`` or
+    ``"dc1394"`` (using ``dc1394_deinterlace_stereo``).
+    """
+    method = stereo_method_vals_short.get(method, method)
+    if method not in ("INTERLACED", "FIELD"):
+        raise ValueError("unsupported stereo method %r" % method)
+    if src.ndim != 2 or src.dtype.itemsize != 2:
+        raise ValueError("src must be a two dimensional 16 bit array")
+    height, width = src.shape
+    shape = 2, height, width
+    if out is None:
+        out = empty(shape, uint8)
+    elif (out.shape != shape or out.dtype != uint8 or
+            not out.flags.c_contiguous):
+        raise ValueError("out must be a C-contiguous uint8 array of "
+                "shape %s" % (shape,))
+    if method == "FIELD":
+        copyto(out.reshape(height, 2*width), src.view(uint8))
+    elif engine == "numpy":
+        copyto(out.transpose(1, 2, 0), src.view(uint8).reshape(
+            height, width, 2))
+    elif engine == "dc1394":
+        src = ascontiguousarray(src)
+        dll.dc1394_deinterlace_stereo(_pointer(src), _pointer(out),
+                width, 2*height)
+    else:
+        raise ValueError("unknown engine %r" % engine)
+    return out
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Embedded image information.
+
+Many IIDC cameras (e.g. by Point Grey) can replace the first pixels of
+each frame with information about the frame. The fields are enabled
+in the frame info register (see
+:attr:`pydc1394.camera2.Camera.embedded_info`) and each enabled field
+occupies one big endian quadlet in the order of :data:`embedded_fields`.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+from numpy import ndarray, dtype, empty, uint8
+
+
+__all__ = ["embedded_fields", "embedded_dtype", "decode_embedded"]
+
+
+# the frame info register (relative to the control registers)
+EMBEDDED_INFO_REGISTER = 0x12f8
+
+# the fields in the order of their enable bits (least significant
+# first) and in the order they appear in the image:
+# timestamp: the cycle timer at the start of the exposure (see
+#     pydc1394.clock), gain, shutter, brightness, exposure, whitebalance:
+#     the feature control registers, framecount and strobecount:
+#     counters, gpio: the pin states, roi: the image position
+embedded_fields = ["timestamp", "gain", "shutter", "brightness",
+    "exposure", "whitebalance", "framecount", "strobecount", "gpio",
+    "roi"]
+
+
+def embedded_dtype(fields):
+    """
+    The structured dtype of the embedded information with the given
+    ``fields`` (in any order) enabled.
+    """
+    return dtype([(name, ">u4") for name in embedded_fields
+        if name in fields])
+
+
+def _big_endian_head(pixels, nbytes):
+    """
+    The first ``nbytes`` bytes of the big endian byte stream of the
+    ``pixels`` (along the last axis), regardless of their byte order.
+    """
+    n = -(-nbytes//pixels.dtype.itemsize)
+    head = pixels[..., :n].astype(pixels.dtype.newbyteorder(">"))
+    return head.view(uint8)[..., :nbytes]
+
+
+def decode_embedded(frames, fields):
+    """
+    Decode the embedded information with the given ``fields`` enabled
+    from a batch of ``frames``.
+
+    ``frames`` is a sequence of frames or an array of stacked frames.
+    16 bit frames may have been converted to native byte order. Returns
+    a structured array (see :func:`embedded_dtype`) with one record per
+    frame. The records are also attached to
+    :class:`pydc1394.frame.Frame` instances with metadata as their
+    ``embedded`` attribute.
+    """
+    typ = embedded_dtype(fields)
+    if isinstance(frames, ndarray) and getattr(frames, "metadata",
+            None) is None:
+        # a stack of frames
+        head = _big_endian_head(frames.reshape(len(frames), -1),
+                typ.itemsize)
+        return head.copy().view(typ).reshape(len(frames))
+    head = empty((len(frames), typ.itemsize), uint8)
+    for i, frame in enumerate(frames):
+        pixels = frame.view(ndarray)
+        line = pixels[0].reshape(-1)
+        if line.nbytes < typ.itemsize: # a very narrow image
+            line = pixels.reshape(-1)
+        head[i] = _big_endian_head(line, typ.itemsize)
+    info = head.view(typ).reshape(len(frames))
+    for frame, record in zip(frames, info):
+        if getattr(frame, "metadata", None) is not None:
+            frame.embedded = record
+    return info
@@ -22,20 +22,329 @@
 from __future__ import (print_function, unicode_literals, division,
         absolute_import)
 
+import sys
 from ctypes import ARRAY, c_byte
-from numpy import ndarray
+from numpy import (ndarray, dtype, empty, uint8, ascontiguousarray, copyto,
+        right_shift)
 
 from .dc1394 import *
+from .convert import yuv_to_rgb, debayer, split_stereo
 
 
-__all__ = ["Frame"]
+__all__ = ["Frame", "FrameMetadata", "BufferPool"]
+
+
+# ctypes array types and numpy dtypes are cached by size and layout so
+# that wrapping a DMA buffer does not define a new type for every frame
+_buffer_types = {}
+_dtypes = {}
+
+
+def _buffer_from_address(address, size):
+    """
+    Wrap ``size`` bytes of memory at ``address`` in a ctypes array
+    (without copying).
+    """
+    try:
+        typ = _buffer_types[size]
+    except KeyError:
+        typ = _buffer_types[size] = ARRAY(c_byte, size)
+    return typ.from_address(address)
+
+
+def _pixel_dtype(little_endian, itemsize, kind="u"):
+    """
+    The (cached) integer dtype for the given byte order, item size and
+    kind (``"u"`` or ``"i"``).
+    """
+    key = little_endian, itemsize, kind
+    try:
+        return _dtypes[key]
+    except KeyError:
+        typ = _dtypes[key] = dtype("%s%s%i" % (
+            little_endian and "<" or ">", kind, itemsize))
+        return typ
+
+
+# The memory layout of each color coding: the kind and size of the
+# samples, the number of pixels per array element along a line (the
+# macro pixel) and the number of samples per element (or None for a
+# two dimensional array).
+_layouts = {
+        "Y8": ("u", 1, 1, None),
+        "RAW8": ("u", 1, 1, None),
+        "Y16": ("u", 2, 1, None),
+        "RAW16": ("u", 2, 1, None),
+        "Y16S": ("i", 2, 1, None),
+        "RGB8": ("u", 1, 1, 3),
+        "RGB16": ("u", 2, 1, 3),
+        "RGB16S": ("i", 2, 1, 3),
+        "YUV444": ("u", 1, 1, 3), # UYV
+        "YUV422": ("u", 1, 1, 2), # UY VY or YU YV
+        "YUV411": ("u", 1, 4, 6), # UYYVYY
+}
+
+
+def _image_layout(f, color_coding):
+    """
+    The dtype, shape and strides of the image described by the
+    video_frame_t ``f``.
+    """
+    width, height = f.size
+    try:
+        kind, itemsize, group, channels = _layouts[color_coding]
+    except KeyError: # assume tightly packed pixels
+        kind, itemsize, group, channels = (
+                "u", f.image_bytes//(width*height), 1, None)
+    typ = _pixel_dtype(f.little_endian, itemsize, kind)
+    shape = height, width//group
+    if channels is None:
+        inner = itemsize,
+    else:
+        shape += channels,
+        inner = channels*itemsize, itemsize
+    stride = f.stride or shape[1]*inner[0]
+    return typ, shape, (stride,) + inner
+
+
+def _refcount(buffers, i):
+    return sys.getrefcount(buffers[i])
+
+# the reference count of an array that is only held by the pool
+_unreferenced = _refcount([object()], 0)
+
+
+class BufferPool(object):
+    """
+    A pool of reusable output arrays keyed by shape and dtype.
+
+    Each :class:`pydc1394.camera2.Camera` maintains one of these as
+    :attr:`pydc1394.camera2.Camera.buffers` for the conversion methods
+    of the frames it returns (:meth:`Frame.to_rgb` etc.). A buffer is
+    handed out again once the consumer has dropped all references to
+    it (and to any views of it). Steady state processing then does not
+    allocate memory.
+
+    At most ``depth`` buffers are retained for each shape and dtype. If
+    all of them are still in use, fresh (unpooled) arrays are returned.
+    """
+
+    def __init__(self, depth=4):
+        self.depth = depth
+        self._buffers = {}
+
+    def get(self, shape, dtype):
+        """
+        Return an unused array of the given ``shape`` and ``dtype``.
+
+        The content of the array is undefined.
+        """
+        key = shape, dtype
+        try:
+            buffers = self._buffers[key]
+        except KeyError:
+            buffers = self._buffers[key] = []
+        for i in range(len(buffers)):
+            if _refcount(buffers, i) <= _unreferenced:
+                return buffers[i]
+        buf = empty(shape, dtype)
+        if len(buffers) < self.depth:
+            buffers.append(buf)
+        return buf
+
+    def clear(self):
+        """
+        Release all buffers.
+        """
+        self._buffers.clear()
+
+
+class _decoded(object):
+    """
+    A read-only attribute of :class:`FrameMetadata` that is decoded
+    from the video_frame_t on first access and then cached.
+    """
+    def __init__(self, decode):
+        self.decode = decode
+        self.name = decode.__name__
+        self.__doc__ = decode.__doc__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.name] = self.decode(obj._frame)
+        return value
+
+
+class FrameMetadata(object):
+    """
+    The immutable metadata of a frame.
+
+    Holds a private copy of the libdc1394 video_frame_t (the original
+    is recycled by libdc1394 once the frame is enqueued) and decodes
+    the fields on first access. A single instance is shared between a
+    :class:`Frame` and all its views, slices, copies and ufunc results.
+    """
+
+    def __init__(self, frame):
+        self.__dict__["_frame"] = video_frame_t.from_buffer_copy(frame)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("frame metadata is read-only")
+
+    __delattr__ = __setattr__
+
+    @_decoded
+    def frame_id(f):
+        """The frame position in the ring buffer."""
+        return f.id
+
+    @_decoded
+    def frames_behind(f):
+        """The number of frames in the ring buffer that are yet to be
+        dequeued."""
+        return f.frames_behind
+
+    @_decoded
+    def size(f):
+        """The image size (width, height) in pixels."""
+        return tuple(f.size)
+
+    @_decoded
+    def position(f):
+        """The ROI position (left, top) in pixels."""
+        return tuple(f.position)
+
+    @_decoded
+    def color_coding(f):
+        """The color coding of the image data, like ``"Y8"``."""
+        return color_coding_vals[f.color_coding]
+
+    @_decoded
+    def color_filter(f):
+        """The Bayer color filter code (only meaningful for RAW
+        images)."""
+        return f.color_filter
+
+    @_decoded
+    def yuv_byte_order(f):
+        """The YUV byte order code (only meaningful for YUV images)."""
+        return f.yuv_byte_order
+
+    @_decoded
+    def data_depth(f):
+        """The number of meaningful bits per pixel and channel."""
+        return f.data_depth
+
+    @_decoded
+    def stride(f):
+        """The number of bytes per image line."""
+        return f.stride
+
+    @_decoded
+    def video_mode(f):
+        """The name of the video mode, like ``"FORMAT7_0"``."""
+        return video_mode_vals[f.video_mode]
+
+    @_decoded
+    def total_bytes(f):
+        """The size of the image buffer including the padding."""
+        return f.total_bytes
+
+    @_decoded
+    def image_bytes(f):
+        """The size of the image data in bytes."""
+        return f.image_bytes
+
+    @_decoded
+    def padding_bytes(f):
+        """The number of padding bytes after the image data."""
+        return f.padding_bytes
+
+    @_decoded
+    def packet_size(f):
+        """The size of an isochronous packet in bytes."""
+        return f.packet_size
+
+    @_decoded
+    def packets_per_frame(f):
+        """The number of isochronous packets per frame."""
+        return f.packets_per_frame
+
+    @_decoded
+    def timestamp(f):
+        """The time the frame was captured in microseconds since the
+        epoch."""
+        return f.timestamp
+
+    @_decoded
+    def little_endian(f):
+        """Is the data in little endian byte order?"""
+        return bool(f.little_endian)
+
+    @_decoded
+    def data_in_padding(f):
+        """Does the padding contain data?"""
+        return bool(f.data_in_padding)
+
+
+class _Release(object):
+    """
+    Returns a frame to the ring buffer when enqueued explicitly or when
+    garbage collected.
+
+    Only the original :class:`Frame` holds a reference to this. Views
+    and copies thus do not need a ``__del__`` which keeps them as cheap
+    as plain arrays.
+    """
+    __slots__ = ("camera", "frame")
+
+    def __init__(self, camera, frame):
+        self.camera = camera
+        self.frame = frame
+
+    def enqueue(self):
+        if self.frame is not None:
+            dll.dc1394_capture_enqueue(self.camera, self.frame)
+            self.frame = None
+            self.camera = None
+
+    __del__ = enqueue
+
+
+def _metadata_property(name):
+    def get(self):
+        if self.metadata is None:
+            return None
+        return getattr(self.metadata, name)
+    return property(get, doc=getattr(FrameMetadata, name).__doc__)
 
 
 class Frame(ndarray):
     """
     A frame returned by the :meth:`pydc1394.camera2.Camera.dequeue`.
 
-    All metadata are retained as attributes of the resulting image.
+    All metadata are available as read-only attributes of the resulting
+    image. They are backed by a :class:`FrameMetadata` record that is
+    shared with all views, slices and copies of the frame.
+
+    The array is a view of the frame data respecting the line
+    :attr:`stride`. Its shape and dtype depend on the color coding:
+
+    ==========================  ==========================  ==========
+    color coding                shape                       dtype
+    ==========================  ==========================  ==========
+    Y8, RAW8                    (height, width)             u1
+    Y16, RAW16, Y16S            (height, width)             u2, i2
+    RGB8                        (height, width, 3)          u1
+    RGB16, RGB16S               (height, width, 3)          u2, i2
+    YUV444                      (height, width, 3) UYV      u1
+    YUV422                      (height, width, 2) UY/VY    u1
+    YUV411                      (height, width/4, 6) UYYVYY u1
+    ==========================  ==========================  ==========
+
+    16 bit data has the byte order of the camera (usually big endian).
+    Use :meth:`to_native` to get a native copy.
 
     .. warning::
        This instance references the original frame data in the DMA
@@ -48,53 +357,56 @@ class Frame(ndarray):
     http://docs.scipy.org/doc/numpy/user/basics.subclassing.html .
     """
 
-    def __new__(cls, camera, frame): 
+    metadata = None
+    _pool = None
+
+    def __new__(cls, camera, frame, pool=None):
         """
         Convert a dc1394 frame into an Frame instance.
+
+        If given, the conversion methods take their output arrays from
+        the :class:`BufferPool` ``pool``.
         """
-        dtyp = ARRAY(c_byte, frame.contents.image_bytes)
-        buf = dtyp.from_address(frame.contents.image)
-        width, height = frame.contents.size
-        pixels = width*height
-        endianess = frame.contents.little_endian and "<" or ">"
-        typ_string = "%su%i" % (endianess,
-                frame.contents.image_bytes/pixels)
-
-        img = ndarray.__new__(cls, shape=(height, width),
-                dtype=typ_string, buffer=buf)
-
-        img.frame_id = frame.contents.id
-        img.frames_behind = frame.contents.frames_behind
-        img.position = frame.contents.position
-        img.packet_size = frame.contents.packet_size
-        img.packets_per_frame = frame.contents.packets_per_frame
-        img.timestamp = frame.contents.timestamp
-        img.video_mode = video_mode_vals[frame.contents.video_mode]
-        img.data_depth = frame.contents.data_depth
-        img.color_coding = color_coding_vals[frame.contents.color_coding]
-        img.color_filter = frame.contents.color_filter
-        img.yuv_byte_order = frame.contents.yuv_byte_order
-        img.stride = frame.contents.stride
+        metadata = FrameMetadata(frame.contents)
+        f = metadata._frame
+        nbytes = f.image_bytes
+        if f.data_in_padding:
+            nbytes += f.padding_bytes
+        buf = _buffer_from_address(f.image, nbytes)
+        typ, shape, strides = _image_layout(f, metadata.color_coding)
+
+        img = ndarray.__new__(cls, shape=shape, dtype=typ, buffer=buf,
+                strides=strides)
+        img.metadata = metadata
         # save camera and frame for enqueue()
         img._frame = frame
         img._cam = camera
+        img._release = _Release(camera, frame)
+        img._pool = pool
         return img
 
     def __array_finalize__(self, img):
         """
         Finalize the new Image class array.
 
-        If called with an image object, inherit the properties of that image.
+        If called with an image object, share the metadata of that image.
         """
-        if img == None:
-            return
         # do not inherit _frame and _cam since we also get called on copy()
         # and should not hold references to the frame in this case
-        for key in ["position", "color_coding", "color_filter",
-                    "yuv_byte_order", "stride", "packet_size",
-                    "packets_per_frame", "timestamp", "frames_behind",
-                    "frame_id", "data_depth", "video_mode"]:
-            setattr(self, key, getattr(img, key, None))
+        self.metadata = getattr(img, "metadata", None)
+
+    frame_id = _metadata_property("frame_id")
+    frames_behind = _metadata_property("frames_behind")
+    position = _metadata_property("position")
+    packet_size = _metadata_property("packet_size")
+    packets_per_frame = _metadata_property("packets_per_frame")
+    timestamp = _metadata_property("timestamp")
+    video_mode = _metadata_property("video_mode")
+    data_depth = _metadata_property("data_depth")
+    color_coding = _metadata_property("color_coding")
+    color_filter = _metadata_property("color_filter")
+    yuv_byte_order = _metadata_property("yuv_byte_order")
+    stride = _metadata_property("stride")
 
     def enqueue(self):
         """
@@ -107,24 +419,17 @@ class Frame(ndarray):
         new-from-templates or copies. Otheriwse an AttributeError will
         be raised.
         """
-        if not hasattr(self, "_frame"): # or self.base is not None:
+        if "_frame" not in self.__dict__: # or self.base is not None:
             raise AttributeError("can only enqueue the original frame")
-        if self._frame is not None:
-            dll.dc1394_capture_enqueue(self._cam, self._frame)
-            self._frame = None
-            self._cam = None
+        self._release.enqueue()
+        self._frame = None
+        self._cam = None
 
     # from contextlib iport closing
     # with closing(camera.dequeue()) as im:
     #   do stuff with im
     close = enqueue
 
-    def __del__(self):
-        try:
-            self.enqueue()
-        except AttributeError:
-            pass
-
     @property
     def corrupt(self):
         """
@@ -146,47 +451,165 @@ class Frame(ndarray):
         return bool(dll.dc1394_capture_is_frame_corrupt(
                     self._cam, self._frame))
    
-    def to_rgb(self):
+    def _output(self, out, shape, typ):
+        """
+        Validate ``out`` or obtain a suitable output array.
+        """
+        if out is None:
+            if self._pool is None:
+                return empty(shape, typ)
+            return self._pool.get(shape, typ)
+        if (out.shape != shape or out.dtype != typ or
+                not out.flags.c_contiguous):
+            raise ValueError("out must be a C-contiguous %s array of "
+                    "shape %s" % (typ, shape))
+        return out
+
+    def _size(self):
+        """
+        The height and width in pixels of this (possibly cropped) image.
+        """
+        height, width = self.shape[:2]
+        layout = _layouts.get(self.color_coding)
+        if layout is not None:
+            width *= layout[2]
+        return height, width
+
+    def _convert(self, func, out):
+        """
+        Call the libdc1394 conversion function ``func`` with the image
+        data and the flat uint8 view of ``out``.
+        """
+        height, width = self._size()
+        # no copy for C-contiguous images
+        inp = ascontiguousarray(self.view(ndarray)).reshape(-1).view(uint8)
+        func(inp, out.reshape(-1).view(uint8), width, height,
+                self.yuv_byte_order, color_coding_codes[self.color_coding],
+                self.data_depth)
+        return out
+
+    def to_rgb(self, out=None, engine="dc1394", threads=None):
         """
         Convert the image to an RGB image.
         
-        Array shape is: (image.shape[0], image.shape[1], 3)
+        Array shape is: (height, width, 3)
         Uses the dc1394_convert_to_RGB() function for the conversion.
+
+        The result is written into ``out`` if given. Otherwise it is
+        taken from the camera's :class:`BufferPool` (for frames returned
+        by :meth:`pydc1394.camera2.Camera.dequeue`) or newly allocated.
+
+        With ``engine="numpy"``, YUV images are converted by
+        :func:`pydc1394.convert.yuv_to_rgb` instead which also works on
+        crops of frames (aligned to whole macro pixels) and can use
+        ``threads`` threads.
         """
-        res = ndarray(3*self.size, dtype='u1')
-        shape = self.shape
-        inp = ndarray(shape=len(self.data), buffer=self.data, dtype='u1')
-        dll.dc1394_convert_to_RGB8(inp, res, 
-                shape[1], shape[0], self.yuv_byte_order,
-                self.color_coding, self.data_depth)
-        res.shape = shape[0], shape[1], 3
-        return res
+        out = self._output(out, self._size() + (3,), "u1")
+        if engine == "numpy":
+            src = self.view(ndarray)
+            src = src.view(uint8).reshape(src.shape[0], -1)
+            return yuv_to_rgb(src, self.color_coding, self.yuv_byte_order,
+                    out, threads)
+        return self._convert(dll.dc1394_convert_to_RGB8, out)
     
-    def to_mono8(self):
+    def debayer(self, method="BILINEAR", out=None, threads=None,
+            color_filter=None):
         """
-        Convert he image to 8 bit gray scale.
+        Demosaic the Bayer pattern image (of color coding ``"RAW8"`` or
+        ``"RAW16"``) to an RGB image.
 
-        Uses the dc1394_convert_to_MONO8() funciton
+        ``color_filter`` defaults to the :attr:`color_filter` reported
+        by the camera. The result is written into ``out`` if given or
+        taken from the camera's :class:`BufferPool`. See
+        :func:`pydc1394.convert.debayer` for ``method`` and ``threads``.
+        """
+        if color_filter is None:
+            color_filter = self.color_filter
+        src = self.view(ndarray)
+        height, width = src.shape
+        if method == "DOWNSAMPLE":
+            shape = height//2, width//2, 3
+        else:
+            shape = height, width, 3
+        out = self._output(out, shape, src.dtype.itemsize == 1 and "u1"
+                or "u2")
+        return debayer(src, color_filter, method, self.data_depth, out,
+                threads)
+
+    def split_stereo(self, method="INTERLACED", out=None, engine="numpy"):
+        """
+        Split the 16 bit image of a stereo camera into the images of its
+        two units.
+
+        Returns the two ``(height, width)`` images as views of a
+        ``uint8`` array of shape ``(2, height, width)``. See
+        :func:`pydc1394.convert.split_stereo` for ``method`` and
+        ``engine`` and :meth:`to_rgb` for ``out``.
+        """
+        out = self._output(out, (2,) + self.shape, "u1")
+        split_stereo(self.view(ndarray), method, out, engine)
+        return out[0], out[1]
+
+    def _copy_out(self, out, typ, shift=0):
+        """
+        Copy the image into ``out`` (or a pooled array) of dtype ``typ``,
+        shifting right by ``shift`` bits, and wrap it as a
+        :class:`Frame` sharing the metadata.
         """
-        res = ndarray(self.size, dtype='u1')
-        shape = self.shape
-        inp = ndarray(shape=len(self.data), buffer=self.data, dtype='u1')
-        dll.dc1394_convert_to_MONO8(inp, res,
-                shape[1], shape[0], self.yuv_byte_order,
-                self.color_coding, self.data_depth)
-        res.shape = shape
+        out = self._output(out, self.shape, typ)
+        src = self.view(ndarray)
+        if shift > 0:
+            right_shift(src, shift, out=out)
+        else:
+            copyto(out, src)
+        res = out.view(Frame)
+        res.metadata = self.metadata
         return res
 
-    def to_yuv422(self):
+    def detach(self, out=None):
+        """
+        Copy the image out of the DMA buffer.
+
+        See :meth:`to_rgb` for ``out``. The result is a :class:`Frame`
+        view of the output array that shares the metadata of this frame
+        but not its DMA buffer and can be kept after enqueueing.
+        """
+        return self._copy_out(out, self.dtype)
+
+    def to_native(self, out=None, align=False):
+        """
+        Copy the image into an array of native byte order.
+
+        The byte swap (if any) is done during the copy and costs no
+        extra pass over the data. If ``align=True``, 16 bit data with a
+        :attr:`data_depth` of less than 16 bits (most significant bit
+        aligned as delivered by the camera) is shifted to be least
+        significant bit aligned, also during the copy.
+
+        See :meth:`detach` for ``out`` and the result.
+        """
+        typ = self.dtype.newbyteorder("=")
+        shift = 0
+        if align:
+            shift = typ.itemsize*8 - (self.data_depth or typ.itemsize*8)
+        return self._copy_out(out, typ, shift)
+
+    def to_mono8(self, out=None):
+        """
+        Convert he image to 8 bit gray scale.
+
+        Uses the dc1394_convert_to_MONO8() funciton. See :meth:`to_rgb`
+        for ``out``.
+        """
+        out = self._output(out, self._size(), "u1")
+        return self._convert(dll.dc1394_convert_to_MONO8, out)
+
+    def to_yuv422(self, out=None):
         """
         Convert he image to YUV422 color format. 
 
-        Uses the dc1394_convert_to_YUV422() function
+        Uses the dc1394_convert_to_YUV422() function. See :meth:`to_rgb`
+        for ``out``.
         """
-        res = ndarray(self.size, dtype='u1')
-        shape = self.shape
-        inp = ndarray(shape=len(self.data), buffer=self.data, dtype='u1')
-        dll.dc1394_convert_to_YUV422(inp, res,
-                shape[1], shape[0], self.yuv_byte_order,
-                self.color_coding, self.data_depth)
-        return ndarray(shape=shape, buffer=res.data, dtype='u2')
+        out = self._output(out, self._size(), "u2")
+        return self._convert(dll.dc1394_convert_to_YUV422, out)
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Synchronized capture from several cameras in one thread.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+import select
+from collections import deque
+try:
+    from time import monotonic
+except ImportError: # python 2
+    from time import time as monotonic
+
+from .dc1394 import DC1394Error
+
+
+__all__ = ["CameraGroup"]
+
+
+class _Poller(object):
+    """
+    Wait for any of a set of file descriptors to become readable using
+    epoll, poll or select (whichever is available).
+    """
+    def __init__(self, fds):
+        self.fds = list(fds)
+        self._ms = False # poll() takes milliseconds, epoll() seconds
+        if hasattr(select, "epoll"):
+            self._poll = select.epoll()
+            for fd in self.fds:
+                self._poll.register(fd, select.EPOLLIN)
+        elif hasattr(select, "poll"):
+            self._poll = select.poll()
+            for fd in self.fds:
+                self._poll.register(fd, select.POLLIN)
+            self._ms = True
+        else:
+            self._poll = None
+
+    def wait(self, timeout=None):
+        """
+        Wait up to ``timeout`` seconds (or indefinitely if ``None``) and
+        return the readable file descriptors.
+        """
+        if self._poll is None:
+            return select.select(self.fds, [], [], timeout)[0]
+        if timeout is None:
+            events = self._poll.poll()
+        elif self._ms:
+            events = self._poll.poll(int(timeout*1e3))
+        else:
+            events = self._poll.poll(timeout)
+        return [fd for fd, event in events]
+
+    def close(self):
+        if hasattr(self._poll, "close"):
+            self._poll.close()
+        self._poll = None
+
+
+class CameraGroup(object):
+    """
+    Capture from several cameras in one thread and assemble the frames
+    into matched sets.
+
+    The capture file descriptors of all cameras are watched with a
+    single epoll and whichever camera is ready is dequeued. Frames
+    whose :attr:`pydc1394.frame.Frame.timestamp` lie within
+    ``tolerance`` seconds of each other form a set (one frame per
+    camera, in the order of ``cameras``).
+
+    Frames that can not be matched (because the other cameras have no
+    frame close enough in time) are enqueued and counted in
+    :attr:`unmatched`. At most ``max_pending`` frames are held per
+    camera while waiting for the others. Older ones are enqueued and
+    counted in :attr:`dropped`. Use a ring buffer size (``bufsize`` in
+    :meth:`start`) larger than ``max_pending``.
+    """
+
+    def __init__(self, cameras, tolerance=1e-3, max_pending=2):
+        self.cameras = list(cameras)
+        self.tolerance = tolerance
+        self.max_pending = max_pending
+        self._pending = [deque() for cam in self.cameras]
+        self._poller = None
+        self.matched = 0
+        self.unmatched = [0]*len(self.cameras)
+        self.dropped = [0]*len(self.cameras)
+
+    def start(self, bufsize=4, broadcast=True):
+        """
+        Set up the capture on all cameras and start the transmission.
+
+        If ``broadcast=True``, the transmission is started with a
+        single broadcast command (see
+        :attr:`pydc1394.camera2.Camera.broadcast`) for the cameras to
+        start simultaneously. Cameras that did not react to the
+        broadcast (or if it is not supported) are started individually.
+
+        .. note::
+           The broadcast command starts the transmission of *all*
+           cameras on the bus, including those that are not part of
+           this group. Use ``broadcast=False`` if other cameras share
+           the bus and must stay idle.
+        """
+        for cam in self.cameras:
+            cam.start_capture(bufsize)
+            cam.flush()
+        self._fds = dict((cam.fileno, i) for i, cam in
+                enumerate(self.cameras))
+        self._poller = _Poller(self._fds)
+        first = self.cameras[0]
+        if broadcast and len(self.cameras) > 1:
+            try:
+                first.broadcast = True
+                try:
+                    first.start_video()
+                finally:
+                    first.broadcast = False
+            except DC1394Error:
+                pass
+        for cam in self.cameras:
+            if not cam.transmitting:
+                cam.start_video()
+
+    def stop(self):
+        """
+        Stop the transmission and capture on all cameras and enqueue
+        the pending frames.
+        """
+        for cam, pending in zip(self.cameras, self._pending):
+            while pending:
+                pending.popleft().enqueue()
+            cam.stop_video()
+            cam.stop_capture()
+        if self._poller is not None:
+            self._poller.close()
+            self._poller = None
+
+    def _receive(self, i):
+        """
+        Dequeue all available frames of camera ``i``.
+        """
+        pending = self._pending[i]
+        while True:
+            frame = self.cameras[i].dequeue(poll=True)
+            if frame is None:
+                break
+            pending.append(frame)
+            if len(pending) > self.max_pending:
+                pending.popleft().enqueue()
+                self.dropped[i] += 1
+
+    def _match(self):
+        """
+        Return a matched set of frames from the pending ones or
+        ``None``. Discards frames that can not be matched.
+        """
+        tolerance = self.tolerance*1e6 # timestamps are in microseconds
+        while all(self._pending):
+            latest = max(p[0].timestamp for p in self._pending)
+            matched = True
+            for i, pending in enumerate(self._pending):
+                while pending and pending[0].timestamp < latest - tolerance:
+                    pending.popleft().enqueue()
+                    self.unmatched[i] += 1
+                    matched = False
+            if matched:
+                self.matched += 1
+                return [p.popleft() for p in self._pending]
+
+    def dequeue(self, timeout=None):
+        """
+        Capture a matched set of frames, one per camera.
+
+        Wait up to ``timeout`` seconds (or indefinitely if ``None``) and
+        return ``None`` if no set could be assembled. Enqueue all frames
+        of the set when done.
+        """
+        if timeout is not None:
+            deadline = monotonic() + timeout
+        while True:
+            frames = self._match()
+            if frames is not None:
+                return frames
+            if timeout is None:
+                ready = self._poller.wait()
+            else:
+                ready = self._poller.wait(max(0, deadline - monotonic()))
+                if not ready:
+                    return
+            for fd in ready:
+                self._receive(self._fds[fd])
+
+    def __iter__(self):
+        while True:
+            yield self.dequeue()
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Declarative decoding of camera registers.
+
+Vendor specific and advanced registers are described once as a
+:class:`RegisterMap` of :class:`Field` objects. The map is read with a
+few block transfers and decoded into a record::
+
+    info = RegisterMap("Info", [
+        ("temperature", Field(0x82c, (11, 0), lambda v: v*.1 - 273.2)),
+        ("serial", Field(0x1f20)),
+        ("firmware", Field(0x1f68, count=6, convert=as_bytes)),
+    ])
+    print(info.read(camera).temperature)
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+from collections import namedtuple
+
+from numpy import array, concatenate, uint32, float32
+
+
+__all__ = ["Field", "RegisterMap", "as_float", "as_bytes"]
+
+
+def as_float(value):
+    """
+    Interpret the register ``value`` as an IEEE single precision float.
+    """
+    return float(array(value, uint32).view(float32))
+
+
+def as_bytes(registers):
+    """
+    The bytes of the ``registers`` (in big endian order like the bus
+    transfers them), e.g. for strings.
+    """
+    return registers.astype(">u4").tobytes()
+
+
+class Field(object):
+    """
+    A field of one or more registers.
+
+    The field is at ``address`` in the register space ``space`` (see
+    :meth:`pydc1394.camera2.Camera.get_registers`). ``bits`` selects a
+    single bit (an integer, 0 being the least significant bit) or a
+    range of bits ``(high, low)`` (inclusive) of a single register.
+    Alternatively a field can span ``count`` consecutive registers
+    whose values are then an array.
+
+    The value is passed through ``convert`` if given.
+    """
+    __slots__ = ["address", "high", "low", "count", "convert", "space"]
+
+    def __init__(self, address, bits=None, convert=None, count=1,
+            space="control"):
+        if bits is None:
+            high, low = 31, 0
+        elif isinstance(bits, tuple):
+            high, low = bits
+        else:
+            high = low = bits
+        if count != 1 and bits is not None:
+            raise ValueError("bits only apply to single registers")
+        if not 31 >= high >= low >= 0:
+            raise ValueError("invalid bit range %r" % (bits,))
+        self.address = address
+        self.high = high
+        self.low = low
+        self.count = count
+        self.convert = convert
+        self.space = space
+
+    def __repr__(self):
+        return "Field(%#x, (%i, %i), count=%i, space=%r)" % (
+                self.address, self.high, self.low, self.count, self.space)
+
+
+class RegisterMap(object):
+    """
+    A named collection of register fields read and decoded together.
+
+    ``fields`` is a sequence of ``(name, field)`` pairs. :meth:`read`
+    returns a :func:`collections.namedtuple` record type ``name`` with
+    these fields.
+
+    The registers of all fields are read as a few blocks: addresses
+    closer than ``max_gap`` quadlets are coalesced into one block
+    including the registers in between. Use ``max_gap=0`` for cameras
+    that fail to read unimplemented registers.
+    """
+
+    def __init__(self, name, fields, max_gap=64):
+        self.fields = list(fields)
+        self.record = namedtuple(name, [n for n, f in self.fields])
+        self.max_gap = max_gap
+        self._plan()
+
+    def _plan(self):
+        """
+        Determine the blocks to read and the location of each field in
+        their concatenation.
+        """
+        self.blocks = []
+        base = {}
+        for space in sorted(set(f.space for n, f in self.fields)):
+            addresses = sorted(set(f.address + 4*i
+                    for n, f in self.fields if f.space == space
+                    for i in range(f.count)))
+            start = prev = addresses[0]
+            for address in addresses[1:] + [None]:
+                if address is None or address - prev > 4*(self.max_gap + 1):
+                    count = (prev - start)//4 + 1
+                    index = sum(c for s, a, c in self.blocks)
+                    for a in range(start, prev + 4, 4):
+                        base[space, a] = index + (a - start)//4
+                    self.blocks.append((space, start, count))
+                    start = address
+                prev = address
+        self._index = [base[f.space, f.address] for n, f in self.fields]
+        single = [i for i, (n, f) in enumerate(self.fields) if f.count == 1]
+        self._single = single
+        self._single_index = array([self._index[i] for i in single], int)
+        self._shift = array([self.fields[i][1].low for i in single], uint32)
+        self._mask = array([(1 << (self.fields[i][1].high -
+            self.fields[i][1].low + 1)) - 1 for i in single], uint32)
+
+    def read(self, camera):
+        """
+        Read and decode all fields from ``camera``.
+        """
+        registers = concatenate([camera.get_registers(address, count,
+            space) for space, address, count in self.blocks])
+        return self.decode(registers)
+
+    def decode(self, registers):
+        """
+        Decode the concatenation of the blocks of ``registers`` (as
+        read by :meth:`read`) into a record.
+        """
+        values = [None]*len(self.fields)
+        raw = (registers[self._single_index] >> self._shift) & self._mask
+        for i, value in zip(self._single, raw.tolist()):
+            values[i] = value
+        for i, (name, field) in enumerate(self.fields):
+            if field.count != 1:
+                index = self._index[i]
+                values[i] = registers[index:index + field.count]
+            if field.convert is not None:
+                values[i] = field.convert(values[i])
+        return self.record(*values)
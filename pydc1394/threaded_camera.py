@@ -35,7 +35,8 @@ __all__ = ["ThreadedCamera"]
 
 
 class ThreadedCamera(Camera):
-    def start(self, queue=0, mark_corrupt=True):
+    def start(self, queue=0, mark_corrupt=True, native=False,
+            align=False):
         """
         Start the handling of acquired frames.
 
@@ -52,9 +53,15 @@ class ThreadedCamera(Camera):
         If ``mark_corrupt=True``, the frames returned have a corruption
         marker attached.
 
+        If ``native=True``, the frames are copied into arrays of native
+        byte order (see :meth:`pydc1394.frame.Frame.to_native`, also for
+        ``align``) taken from the camera's :attr:`buffers`.
+
         End the acquisition by calling :meth:`stop`.
         """
         self.mark_corrupt = mark_corrupt
+        self.native = native
+        self.align = align
         self.abort_thread = Event()
         self.new_image = Condition()
         if queue == 1:
@@ -72,10 +79,14 @@ class ThreadedCamera(Camera):
         the most recent as :attr:`current`.
         """
         while not self.abort_thread.is_set():
-            img = self.dequeue(poll=False)
+            # wake up regularly to notice stop()
+            img = self.dequeue(timeout=.1)
             if img is None:
                 continue
-            img_copy = img.copy()
+            if self.native:
+                img_copy = img.to_native(align=self.align)
+            else:
+                img_copy = img.copy()
             if self.mark_corrupt:
                 img_copy.corruption_marker = img.corrupt
             img.enqueue() # need to enqueue in the same thread
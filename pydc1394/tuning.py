@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Finding the Format7 settings for a frame rate by measurement.
+
+The frame rate of a Format7 mode is set indirectly through the packet
+size (see :mod:`pydc1394.bandwidth`) and limited by the sensor readout
+of the ROI and the shutter. :class:`Format7Tuner` tries the legal
+packet sizes and ROI alignments and measures the rate actually
+delivered.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+from collections import namedtuple
+
+from .dc1394 import USE_RECOMMENDED, DC1394Error
+from .clock import CYCLES_PER_SECOND
+from .camera2 import Format7, _frame_bytes
+from .bandwidth import max_payload
+
+
+__all__ = ["Format7Tuner", "TuningResult"]
+
+
+class TuningResult(namedtuple("TuningResult", [
+        "image_size", "image_position", "color_coding", "packet_size",
+        "frame_interval", "rate"])):
+    """
+    A measured Format7 configuration as returned by
+    :meth:`Format7Tuner.run`.
+
+    ``frame_interval`` is the interval reported by the camera (see
+    :attr:`pydc1394.camera2.Format7.frame_interval`, ``None`` if not
+    supported) and ``rate`` is the measured rate of delivered frames
+    per second.
+    """
+    __slots__ = ()
+
+
+class Format7Tuner(object):
+    """
+    Search the packet sizes and ROI alignments of a Format7 mode for a
+    target frame ``rate`` (or the maximum rate if ``None``).
+
+    ``mode`` is the :class:`pydc1394.camera2.Format7` mode or its name
+    and defaults to the current mode of ``camera``. The ROI to cover is
+    given by ``image_size`` and ``image_position`` (default: the
+    current ROI) in ``color_coding`` (default: the current one).
+
+    Each candidate is measured by capturing ``frames`` frames (after
+    ``skip`` frames to settle) from a ring buffer of ``bufsize`` and
+    the rate is computed from the frame timestamps. A candidate that
+    delivers no frame within ``timeout`` seconds or that the camera
+    rejects has a rate of zero.
+    Rates within the relative ``tolerance`` of the best are considered
+    equal and the smallest packet size (least bandwidth), then the
+    largest ROI wins.
+
+    The transmission of the camera must be stopped.
+    """
+
+    def __init__(self, camera, mode=None, image_size=None,
+            image_position=None, color_coding=None, rate=None, frames=30,
+            skip=3, bufsize=8, timeout=1., tolerance=.01):
+        if mode is None:
+            mode = camera.mode
+        elif not isinstance(mode, Format7):
+            mode = camera.modes_dict[mode]
+        if not isinstance(mode, Format7):
+            raise ValueError("%s is not a Format7 mode" % mode)
+        self.camera = camera
+        self.mode = mode
+        self.image_size = image_size or mode.image_size
+        self.image_position = image_position or mode.image_position
+        self.color_coding = color_coding or mode.color_coding
+        self.rate = rate
+        self.frames = frames
+        self.skip = skip
+        self.bufsize = bufsize
+        self.timeout = timeout
+        self.tolerance = tolerance
+        self.results = []
+
+    def rois(self):
+        """
+        The candidate ROIs as ``(image_size, image_position)`` pairs:
+        the requested ROI aligned to the units of the mode, shrunk to
+        fit inside it and grown to cover it.
+        """
+        info = self.mode.info
+        shrunk, grown = [], []
+        for s, p, su, pu, m in zip(self.image_size, self.image_position,
+                info.unit_size, info.unit_position, info.max_image_size):
+            pu = pu or 1
+            start = min(-(-p//pu)*pu, (m - su)//pu*pu)
+            size = min(p + s, m) - start
+            shrunk.append((max(su, size//su*su), start))
+            start = min(p, m - su)//pu*pu
+            size = -(-(p + s - start)//su)*su
+            if start + size > m:
+                start = max(0, (m - size)//pu*pu)
+                size = min(size, (m - start)//su*su)
+            grown.append((size, start))
+        rois = []
+        for roi in shrunk, grown:
+            roi = tuple(s for s, p in roi), tuple(p for s, p in roi)
+            if roi not in rois:
+                rois.append(roi)
+        return rois
+
+    def packet_sizes(self, image_size):
+        """
+        The candidate packet sizes for frames of ``image_size``, which
+        must be the current ROI size of the mode.
+
+        With a target rate these are the smallest packets that allow the
+        target on the bus and some larger ones to make up for the
+        overhead of the camera. Otherwise they are the maximum, the
+        recommended and some smaller packets that may be enough if the
+        sensor limits the rate.
+        """
+        unit, maximum = self.mode.packet_parameters
+        maximum = min(maximum, max_payload[self.camera.iso_speed])
+        frame_bytes = _frame_bytes(image_size, self.color_coding)
+        if self.rate is None:
+            sizes = [maximum*f for f in (1, .75, .5, .25)]
+            try:
+                sizes.append(self.mode.recommended_packet_size)
+            except DC1394Error:
+                pass
+        else:
+            sizes = [frame_bytes*self.rate*f/CYCLES_PER_SECOND
+                    for f in (1, 1.1, 1.25, 1.5, 2)]
+        packets = set()
+        for size in sizes:
+            size = -(-int(size)//unit)*unit
+            packets.add(max(unit, min(maximum, size)))
+        return sorted(packets)
+
+    def measure(self, image_size, image_position, packet_size):
+        """
+        Apply and measure one configuration and return its
+        :class:`TuningResult`.
+
+        If the camera rejects the configuration, the result has a rate
+        of zero and no ``frame_interval``.
+        """
+        try:
+            self.mode.roi = (image_size, image_position, self.color_coding,
+                    packet_size)
+        except (ValueError, DC1394Error):
+            return TuningResult(tuple(image_size), tuple(image_position),
+                    self.color_coding, packet_size, None, 0.)
+        try:
+            interval = self.mode.frame_interval
+        except DC1394Error:
+            interval = None
+        stamps = []
+        try:
+            with self.camera.stream(self.bufsize,
+                    n=self.skip + self.frames,
+                    timeout=self.timeout) as frames:
+                for i, frame in enumerate(frames):
+                    if i >= self.skip:
+                        stamps.append(frame.timestamp)
+        except (ValueError, DC1394Error):
+            return TuningResult(tuple(image_size), tuple(image_position),
+                    self.color_coding, packet_size, None, 0.)
+        if len(stamps) > 1 and stamps[-1] > stamps[0]:
+            rate = (len(stamps) - 1)/((stamps[-1] - stamps[0])*1e-6)
+        else:
+            rate = 0.
+        return TuningResult(tuple(image_size), tuple(image_position),
+                self.color_coding, packet_size, interval, rate)
+
+    def best(self, results=None):
+        """
+        The best of the ``results`` (default: :attr:`results`) or
+        ``None`` if no configuration delivered frames.
+        """
+        results = results or self.results
+        def score(r):
+            return r.rate if self.rate is None else min(r.rate, self.rate)
+        top = max([score(r) for r in results] + [0.])
+        if not top:
+            return None
+        return min((r for r in results
+            if score(r) >= top*(1 - self.tolerance)),
+            key=lambda r: (r.packet_size, -r.image_size[0]*r.image_size[1]))
+
+    def run(self, apply=True):
+        """
+        Measure all candidates and return the best
+        :class:`TuningResult` (``None`` if no candidate delivered
+        frames). All measurements are kept in :attr:`results`, failed
+        ones with a rate of zero.
+
+        The packet parameters are read from the camera after setting
+        each ROI as they depend on it. With ``apply=True`` the best
+        configuration is left set in the camera. Otherwise the previous
+        mode and ROI are restored.
+        """
+        previous = self.camera.mode, self.mode.roi
+        self.camera.mode = self.mode
+        self.results = []
+        best = None
+        try:
+            for size, position in self.rois():
+                try:
+                    self.mode.roi = (size, position, self.color_coding,
+                            USE_RECOMMENDED)
+                    packet_sizes = self.packet_sizes(size)
+                except (ValueError, DC1394Error):
+                    self.results.append(TuningResult(size, position,
+                        self.color_coding, None, None, 0.))
+                    continue
+                for packet_size in packet_sizes:
+                    self.results.append(self.measure(size, position,
+                        packet_size))
+            best = self.best()
+        finally:
+            if apply and best is not None:
+                self.mode.roi = (best.image_size, best.image_position,
+                        best.color_coding, best.packet_size)
+            else:
+                self.mode.roi = previous[1]
+                self.camera.mode = previous[0]
+        return best
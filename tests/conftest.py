@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+A fake libdc1394 for testing without cameras (or the library).
+
+The ``dll`` fixture replaces the library in the pydc1394 modules with a
+:class:`FakeDll` whose functions succeed without doing anything unless
+given an implementation, and record their calls.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+import ctypes
+import ctypes.util
+import importlib
+
+import pytest
+
+
+class FakeFunction(object):
+    """
+    A libdc1394 function that records the arguments of its calls and
+    returns ``impl(*args)`` (or 0, success).
+    """
+    def __init__(self, name):
+        self.__name__ = str(name)
+        self.calls = []
+        self.impl = None
+
+    def __call__(self, *args):
+        self.calls.append(args)
+        if self.impl is not None:
+            return self.impl(*args)
+        return 0
+
+
+class FakeDll(object):
+    """
+    A libdc1394 made of :class:`FakeFunction` objects.
+    """
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        func = FakeFunction(name)
+        setattr(self, name, func)
+        return func
+
+    def count(self, match=""):
+        """
+        The number of calls of the functions containing ``match`` in
+        their name.
+        """
+        return sum(len(f.calls) for name, f in vars(self).items()
+                if match in name)
+
+
+if ctypes.util.find_library("dc1394") is None:
+    # import pydc1394 without the library
+    _load = ctypes.cdll.LoadLibrary
+    ctypes.cdll.LoadLibrary = lambda name: FakeDll()
+    try:
+        importlib.import_module("pydc1394")
+    finally:
+        ctypes.cdll.LoadLibrary = _load
+
+from pydc1394 import camera2, frame
+from pydc1394.dc1394 import camera_t
+
+
+@pytest.fixture
+def dll(monkeypatch):
+    fake = FakeDll()
+    for module in camera2, frame:
+        monkeypatch.setattr(module, "dll", fake)
+    return fake
+
+
+@pytest.fixture
+def camera(dll):
+    """
+    A camera without features and modes on the fake library.
+    """
+    handle = ctypes.pointer(camera_t())
+    cam = camera2.Camera(context=camera2.Context(), handle=handle)
+    yield cam
+    cam._cam = None
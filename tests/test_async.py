@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Asynchronous capture (Camera.next_frame and Camera.frames) against a
+fake capture whose file descriptor is a pipe.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+import os
+import ctypes
+from collections import deque
+
+import pytest
+
+from pydc1394.dc1394 import video_frame_t, color_coding_codes
+
+asyncio = pytest.importorskip("asyncio")
+
+
+class PipeCapture(object):
+    """
+    A capture ring that delivers frames by writing a byte to a pipe
+    whose read end is the capture file descriptor.
+    """
+    def __init__(self, dll):
+        self.fd, self._write = os.pipe()
+        self._ready = deque()
+        self._keep = []
+        dll.dc1394_capture_get_fileno.impl = lambda cam: self.fd
+        dll.dc1394_capture_dequeue.impl = self.dequeue
+
+    def deliver(self, timestamp):
+        buf = ctypes.create_string_buffer(8*4)
+        f = video_frame_t()
+        f.image = ctypes.addressof(buf)
+        f.size[:] = 8, 4
+        f.color_coding = color_coding_codes["Y8"]
+        f.image_bytes = 8*4
+        f.timestamp = timestamp
+        self._keep.append((buf, f))
+        self._ready.append(f)
+        os.write(self._write, b"x")
+
+    def dequeue(self, cam, policy, frame):
+        if self._ready:
+            os.read(self.fd, 1)
+            frame._obj.contents = self._ready.popleft()
+        return 0
+
+    def close(self):
+        os.close(self.fd)
+        os.close(self._write)
+
+
+@pytest.fixture
+def capture(dll):
+    capture = PipeCapture(dll)
+    yield capture
+    capture.close()
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def test_next_frame_available(camera, capture, loop):
+    capture.deliver(1)
+    future = camera.next_frame(loop)
+    assert future.done()
+    assert future.result().timestamp == 1
+    assert not loop.remove_reader(capture.fd)
+
+
+def test_next_frame_waits_on_fd(camera, capture, loop):
+    future = camera.next_frame(loop)
+    assert not future.done()
+    loop.call_later(.01, capture.deliver, 2)
+    frame = loop.run_until_complete(asyncio.wait_for(future, 1))
+    assert frame.timestamp == 2
+    assert frame.shape == (4, 8)
+    # the reader is removed once the frame arrived
+    assert not loop.remove_reader(capture.fd)
+
+
+def test_next_frame_cancel(camera, capture, loop):
+    future = camera.next_frame(loop)
+    future.cancel()
+    loop.run_until_complete(asyncio.sleep(0))
+    assert not loop.remove_reader(capture.fd)
+
+
+def test_frames(camera, capture, loop):
+    stream = camera.frames(loop)
+    assert stream.__aiter__() is stream
+    for t in range(3):
+        loop.call_later(.01, capture.deliver, t)
+        frame = loop.run_until_complete(asyncio.wait_for(
+            stream.__anext__(), 1))
+        assert frame.timestamp == t
+
+
+def test_next_frame_running_loop(camera, capture, loop):
+    futures = []
+    loop.call_soon(lambda: futures.append(camera.next_frame()))
+    loop.run_until_complete(asyncio.sleep(0))
+    future, = futures
+    loop.call_later(.01, capture.deliver, 3)
+    frame = loop.run_until_complete(asyncio.wait_for(future, 1))
+    assert frame.timestamp == 3
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+The conversion benchmark in examples/ on synthetic frames.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+import os
+
+import pytest
+
+
+@pytest.fixture
+def benchmark(dll, monkeypatch):
+    monkeypatch.syspath_prepend(os.path.join(os.path.dirname(__file__),
+        os.pardir, "examples"))
+    import benchmark
+    monkeypatch.setattr(benchmark, "dll", dll)
+    return benchmark
+
+
+def test_legacy_to_rgb(benchmark, dll):
+    frame, data = benchmark.fake_frame(width=64, height=48,
+            coding="YUV422", bytes_per_pixel=2)
+    img = benchmark.Frame(None, frame)
+    img._release.frame = None
+    res = benchmark.legacy_to_rgb(img)
+    assert res.shape == (48, 64, 3)
+    call, = dll.dc1394_convert_to_RGB8.calls
+    assert call[2:4] == (64, 48)
+
+
+def test_bench_conversion(benchmark, dll, capsys):
+    benchmark.bench_conversion(100)
+    assert "YUV422 to RGB8" in capsys.readouterr()[0]
+    # legacy, out= and buffer pool all convert 1280x960 pixels
+    assert set(c[2:4] for c in dll.dc1394_convert_to_RGB8.calls) == set(
+            [(1280, 960)])
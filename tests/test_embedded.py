@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Decoding of the embedded image information.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+import numpy as np
+import pytest
+
+from pydc1394 import Frame
+from pydc1394.embedded import decode_embedded
+
+
+@pytest.fixture
+def stack():
+    """
+    Three 16 bit frames with timestamp and gain embedded.
+    """
+    stack = np.zeros((3, 4, 8), ">u2")
+    for i in range(3):
+        stack[i, 0, :4] = np.array([0x1000 + i, 20 + i], ">u4").view(">u2")
+    return stack
+
+
+def test_decode_stack(stack):
+    info = decode_embedded(stack, ["gain", "timestamp"])
+    assert info["timestamp"].tolist() == [0x1000, 0x1001, 0x1002]
+    assert info["gain"].tolist() == [20, 21, 22]
+    # native byte order copies decode the same
+    native = decode_embedded(stack.astype("=u2"), ["timestamp", "gain"])
+    assert (native == info).all()
+
+
+def test_camera_decode_stack(camera, stack):
+    camera._embedded_fields = ["timestamp", "gain"]
+    info = camera.decode_embedded(np.zeros((3, 4, 8), ">u2"))
+    assert info["timestamp"].tolist() == [0, 0, 0]
+    info = camera.decode_embedded(stack)
+    assert info["gain"].tolist() == [20, 21, 22]
+
+
+def test_camera_decode_frame_without_metadata(camera, stack):
+    camera._embedded_fields = ["timestamp", "gain"]
+    info = camera.decode_embedded(np.zeros((2, 4, 8), ">u2").view(Frame))
+    assert info["timestamp"].tolist() == [0, 0]
+    frames = list(stack.view(Frame))
+    info = camera.decode_embedded(frames)
+    assert info["gain"].tolist() == [20, 21, 22]
+    assert all(frame.metadata is None for frame in frames)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Format7 packet parameters that depend on the ROI.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+import pytest
+
+from pydc1394 import BandwidthPlanner
+from pydc1394.camera2 import Format7, Format7Info
+from pydc1394.dc1394 import color_coding_codes, USE_RECOMMENDED
+
+
+class Format7State(object):
+    """
+    The registers of one Format7 mode behind the fake library. The
+    packet unit is a tenth of the ROI width.
+    """
+    def __init__(self, dll):
+        self.roi = [640, 480, 0, 0, color_coding_codes["Y8"], 1000]
+        dll.dc1394_format7_set_roi.impl = self.set_roi
+        dll.dc1394_format7_get_roi.impl = self.get_roi
+        dll.dc1394_format7_get_packet_parameters.impl = self.get_packet
+        dll.dc1394_format7_set_packet_size.impl = self.set_packet_size
+        dll.dc1394_get_color_coding_bit_size.impl = self.bit_size
+
+    def set_roi(self, cam, mode, color, packet_size, x, y, w, h):
+        if packet_size == USE_RECOMMENDED:
+            packet_size = w//10*4
+        self.roi = [w, h, x, y, color, packet_size]
+        return 0
+
+    def get_roi(self, cam, mode, color, packet_size, x, y, w, h):
+        for ref, value in zip((w, h, x, y, color, packet_size), self.roi):
+            ref._obj.value = value
+        return 0
+
+    def get_packet(self, cam, mode, unit, maximum):
+        unit._obj.value = self.roi[0]//10
+        maximum._obj.value = 4096
+        return 0
+
+    def set_packet_size(self, cam, mode, packet_size):
+        self.roi[5] = packet_size
+        return 0
+
+    def bit_size(self, color, bits):
+        bits._obj.value = 8
+        return 0
+
+
+@pytest.fixture
+def state(dll):
+    return Format7State(dll)
+
+
+@pytest.fixture
+def mode(camera, state):
+    return Format7(camera._cam, 88, Format7Info((1280, 960), (8, 2),
+        (8, 2), ("Y8", "Y16"), None))
+
+
+def test_packet_parameters_follow_roi(mode, dll):
+    mode.roi = (320, 240), (0, 0), "Y8", USE_RECOMMENDED
+    assert mode.packet_parameters == (32, 4096)
+    mode.roi = (640, 480), (0, 0), "Y8", USE_RECOMMENDED
+    assert mode.packet_parameters == (64, 4096)
+    assert len(dll.dc1394_format7_get_packet_parameters.calls) == 2
+
+
+def test_roi_packet_size_unchecked(mode, state):
+    # not a multiple of the unit of the current ROI but of the new one
+    mode.roi = (320, 240), (0, 0), "Y8", 96
+    assert mode.roi == ((320, 240), (0, 0), "Y8", 96)
+    with pytest.raises(ValueError):
+        mode.roi = (321, 240), (0, 0), "Y8", 96
+
+
+def test_setup_rounds_packet_for_new_roi(mode, dll):
+    mode.roi = (320, 240), (0, 0), "Y8", USE_RECOMMENDED
+    assert mode.setup((640, 480), (0, 0), "Y8", 1000) == (
+            (640, 480), (0, 0), "Y8", 960)
+    assert [c[2] for c in dll.dc1394_format7_set_packet_size.calls] == [
+            960]
+
+
+class StandInCamera(object):
+    iso_speed = 400
+
+    def __init__(self, mode):
+        self.mode = mode
+
+
+def test_planner_packet_parameters(mode, state):
+    camera = StandInCamera(mode)
+    planner = BandwidthPlanner()
+    planner.add(camera, image_size=(320, 240), color_coding="Y8", rate=15)
+    entry, = planner.plan()
+    # the unit of the planned ROI, not of the current one
+    assert entry.packet_size % 32 == 0 and entry.packet_size % 64
+    assert entry.rate >= 15
+    assert state.roi[:2] == [640, 480]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+Block register access with slices.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+import pytest
+
+
+@pytest.fixture
+def registers(dll):
+    """
+    Fake control registers holding their address.
+    """
+    def get(cam, offset, vals, count):
+        for i in range(count):
+            vals[i] = offset + 4*i
+        return 0
+    dll.dc1394_get_control_registers.impl = get
+    return dll.dc1394_get_control_registers
+
+
+def test_slice(camera, registers):
+    vals = camera[0x1d00:0x1f00]
+    assert vals.tolist() == list(range(0x1d00, 0x1f00, 4))
+    # in blocks of 128 quadlets
+    assert [(offset, count) for cam, offset, vals, count
+            in registers.calls] == [(0x1d00, 128)]
+    assert camera[0x100:0x108:4].tolist() == [0x100, 0x104]
+
+
+@pytest.mark.parametrize("key", [slice(None, 0x10), slice(0x1d00, None),
+    slice(None, None)])
+def test_open_slice(camera, registers, key):
+    with pytest.raises(ValueError, match="explicit start and stop"):
+        camera[key]
+    with pytest.raises(ValueError, match="explicit start and stop"):
+        camera[key] = [0]
+
+
+def test_slice_step(camera, registers):
+    with pytest.raises(ValueError):
+        camera[0x100:0x110:8]
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+The libdc1394 calls issued by Feature.setup and Camera.setup.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+import ctypes
+
+import pytest
+
+from pydc1394 import camera2
+from pydc1394.dc1394 import (camera_t, feature_vals, feature_codes,
+        feature_mode_codes, FEATURE_MIN)
+
+
+class FeatureState(object):
+    """
+    The feature state reported by the fake dc1394_feature_get_all and
+    dc1394_feature_get.
+    """
+    def __init__(self, dll):
+        self.features = {}
+        dll.dc1394_feature_get_all.impl = self.get_all
+        dll.dc1394_feature_get.impl = self.get
+
+    def add(self, name, absolute=1.5, readable=True, mode="manual"):
+        self.features[name] = dict(available=1, absolute_capable=1,
+                readout_capable=int(readable), on_off_capable=1, is_on=1,
+                current_mode=feature_mode_codes[mode], abs_control=1,
+                abs_value=absolute, abs_min=0, abs_max=10, max=1000)
+
+    def _fill(self, finfo):
+        finfo.modes.num = 3
+        finfo.modes.modes[:3] = sorted(feature_mode_codes.values())[:3]
+        for key, value in self.features[feature_vals[finfo.id]].items():
+            setattr(finfo, key, value)
+
+    def get_all(self, cam, featureset):
+        for name in self.features:
+            finfo = featureset._obj.feature[feature_codes[name] -
+                    FEATURE_MIN]
+            finfo.id = feature_codes[name]
+            self._fill(finfo)
+        return 0
+
+    def get(self, cam, finfo):
+        self._fill(finfo._obj)
+        return 0
+
+
+@pytest.fixture
+def state(dll):
+    state = FeatureState(dll)
+    state.add("gain")
+    state.add("shutter", readable=False)
+    return state
+
+
+@pytest.fixture
+def camera(dll, state):
+    cam = camera2.Camera(context=camera2.Context(),
+            handle=ctypes.pointer(camera_t()))
+    yield cam
+    cam._cam = None
+
+
+def reset(dll):
+    for func in vars(dll).values():
+        del func.calls[:]
+
+
+def test_identical_setup(camera, dll):
+    for i in range(2):
+        reset(dll)
+        assert camera.setup(gain=1.5) == {"gain": {}}
+        assert dll.count("feature_get_all") == 1
+        assert dll.count("_set_") == 0
+
+
+def test_changed_absolute(camera, dll):
+    reset(dll)
+    assert camera.setup(gain=2.5) == {"gain": {"absolute": 2.5}}
+    assert dll.count("feature_get_all") == 1
+    assert dll.count("_set_") == 1
+    assert dll.dc1394_feature_set_absolute_value.calls == [
+            (camera._cam, feature_codes["gain"], 2.5)]
+
+
+def test_float_precision(camera, dll, state):
+    # the camera stores single precision
+    state.add("gain", absolute=ctypes.c_float(.1).value)
+    reset(dll)
+    assert camera.setup(gain=.1) == {"gain": {}}
+    assert dll.count("_set_") == 0
+
+
+def test_feature_setup_reads_state_once(camera, dll):
+    reset(dll)
+    assert camera.gain.setup(1.5) == {}
+    assert len(dll.dc1394_feature_get.calls) == 1
+    assert dll.count("_set_") == 0
+
+
+def test_one_push(camera, dll):
+    for i in range(2):
+        reset(dll)
+        # an action, triggered every time, and no value is written
+        assert camera.gain.setup(3., mode="one_push") == {
+                "mode": "one_push"}
+        assert dll.dc1394_feature_set_mode.calls == [(camera._cam,
+            feature_codes["gain"], feature_mode_codes["one_push"])]
+        assert dll.count("_set_") == 1
+
+
+def test_auto(camera, dll, state):
+    state.add("gain", mode="auto")
+    reset(dll)
+    assert camera.gain.setup(3., mode="auto") == {}
+    assert dll.count("_set_") == 0
+
+
+def test_unreadable(camera, dll):
+    for i in range(2):
+        reset(dll)
+        # the value can not be compared and is always written
+        assert camera.setup(shutter=1.5) == {"shutter": {"absolute": 1.5}}
+        assert dll.count("feature_get_all") == 1
+        assert dll.count("_set_") == 1
+        assert len(dll.dc1394_feature_set_absolute_value.calls) == 1
+
+
+def test_inactive(camera, dll, state):
+    state.features["gain"]["is_on"] = 0
+    reset(dll)
+    assert camera.setup(gain=1.5) == {"gain": {"active": True}}
+    assert dll.dc1394_feature_set_power.calls == [(camera._cam,
+        feature_codes["gain"], True)]
+    assert dll.count("_set_") == 1
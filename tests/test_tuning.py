@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of pydc1394.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston,
+# MA  02110-1301  USA
+
+"""
+The candidates and the search of Format7Tuner against a simulated
+Format7 mode.
+"""
+
+from __future__ import (print_function, unicode_literals, division,
+        absolute_import)
+
+from contextlib import contextmanager
+
+import pytest
+
+from pydc1394 import Format7Tuner
+from pydc1394.dc1394 import DC1394Error
+from pydc1394.bandwidth import frame_rate
+from pydc1394.camera2 import Format7, Format7Info
+
+
+class SimulatedMode(Format7):
+    """
+    A Y8 Format7 mode that keeps its ROI and delivers frames as fast as
+    the packets allow (up to 40 per second). The packet unit is a
+    tenth of the ROI width.
+    """
+    def __init__(self, reject=()):
+        super(SimulatedMode, self).__init__(None, 88, Format7Info(
+            (1280, 960), (8, 2), (8, 2), ("Y8",), None))
+        self.current = (640, 480), (0, 0), "Y8", 1000
+        self.reject = reject
+        self.history = []
+
+    @property
+    def roi(self):
+        return self.current
+
+    @roi.setter
+    def roi(self, roi):
+        if roi[3] in self.reject:
+            raise DC1394Error("packet size rejected")
+        self.history.append(roi)
+        self.current = roi
+
+    image_size = property(lambda self: self.current[0])
+    image_position = property(lambda self: self.current[1])
+    color_coding = property(lambda self: self.current[2])
+    recommended_packet_size = 2000
+
+    @property
+    def packet_parameters(self):
+        return self.current[0][0]//10, 4096
+
+    @property
+    def rate(self):
+        size = self.current[0]
+        return min(40., frame_rate(size[0]*size[1], self.current[3]))
+
+    @property
+    def frame_interval(self):
+        return 1/self.rate
+
+
+class Frame(object):
+    def __init__(self, timestamp):
+        self.timestamp = timestamp
+
+
+class SimulatedCamera(object):
+    iso_speed = 400
+
+    def __init__(self, mode):
+        self.mode = mode
+
+    @contextmanager
+    def stream(self, bufsize, n, timeout):
+        rate = self.mode.rate
+        yield (Frame(i*1e6/rate) for i in range(n))
+
+
+@pytest.fixture
+def mode(dll):
+    def bit_size(color, bits):
+        bits._obj.value = 8
+        return 0
+    dll.dc1394_get_color_coding_bit_size.impl = bit_size
+    return SimulatedMode()
+
+
+def test_rois(mode):
+    tuner = Format7Tuner(SimulatedCamera(mode), image_size=(101, 51),
+            image_position=(5, 3))
+    shrunk, grown = tuner.rois()
+    # inside the requested region
+    assert shrunk == ((96, 50), (8, 4))
+    # covering it
+    assert grown == ((112, 52), (0, 2))
+
+
+def test_rois_edge(mode):
+    tuner = Format7Tuner(SimulatedCamera(mode), image_size=(100, 50),
+            image_position=(1275, 955))
+    # clipped to the sensor
+    assert tuner.rois() == [((8, 4), (1272, 956)),
+            ((104, 52), (1176, 908))]
+
+
+def test_packet_parameters_of_roi(mode):
+    tuner = Format7Tuner(SimulatedCamera(mode), image_size=(320, 240),
+            image_position=(0, 0))
+    tuner.run()
+    # the units of each ROI apply to its packets
+    for r in tuner.results:
+        assert r.packet_size % (r.image_size[0]//10) == 0
+
+
+def test_rejected_candidate(mode):
+    # the smallest packet for 15 frames per second
+    mode.reject = (576,)
+    tuner = Format7Tuner(SimulatedCamera(mode), image_size=(640, 480),
+            image_position=(0, 0), rate=15)
+    best = tuner.run()
+    rejected = [r for r in tuner.results if r.packet_size == 576]
+    assert len(rejected) == 1
+    assert rejected[0].rate == 0 and rejected[0].frame_interval is None
+    assert len(tuner.results) > 1
+    assert best.rate >= 15 and best.packet_size == 640
+    assert mode.current[3] == best.packet_size
+
+
+def test_nothing_delivered(mode):
+    mode.reject = set(range(4, 4097)) - set([1000])
+    previous = mode.current
+    tuner = Format7Tuner(SimulatedCamera(mode))
+    assert tuner.run() is None
+    assert all(r.rate == 0 for r in tuner.results)
+    assert mode.current == previous